@@ -0,0 +1,4 @@
+from mcim_translate.cli import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+from openai import AsyncOpenAI
+from pydantic import BaseModel
+from pymongo import AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+from typing import Dict, List, Union
+import random
+import time
+
+from mcim_translate.translate import Translation, Provider, translated_collection_name
+from mcim_translate.translate.ratelimit import AdaptiveLimiter
+from mcim_translate.pipeline import TranslationPipeline
+from mcim_translate.pipeline.budget import TokenBudget
+from mcim_translate.database.mongodb.index import ensure_indexes
+from mcim_translate.constants import Mode, Platform
+from mcim_translate.logger import log
+
+WORDS = (
+    "adds new blocks items mobs biomes dimensions tools armor weapons recipes "
+    "machines energy storage automation magic spells structures villagers ores "
+    "performance rendering chunks server client config compatibility with the "
+    "and for your world players multiplayer fabric forge quilt api library"
+).split()
+
+# 不需要翻译、会被跳过的文本
+TRIVIAL_TEXTS = ["", "1.20.1", "JEI", "https://example.com", "✨🔥", "已经是中文的简介"]
+
+
+def synthetic_text(rng: random.Random) -> str:
+    sentences = []
+    for _ in range(rng.randint(1, 4)):
+        words = rng.choices(WORDS, k=rng.randint(6, 24))
+        sentence = " ".join(words).capitalize() + "."
+        roll = rng.random()
+        if roll < 0.1:
+            sentence += f" See https://example.com/{rng.randint(1, 9999)} for details."
+        elif roll < 0.2:
+            sentence = f"**{sentence}**"
+        sentences.append(sentence)
+    return " ".join(sentences)
+
+
+async def seed(
+    database: AsyncDatabase,
+    platform: Platform,
+    count: int,
+    trivial_ratio: float = 0.1,
+    random_seed: int = 0,
+):
+    """
+    重建待翻译集合，写入 count 条合成记录
+    """
+    rng = random.Random(random_seed)
+    collection = database.get_collection(translated_collection_name(platform))
+    await collection.drop()
+    await ensure_indexes(database)
+    documents = [
+        {
+            "_id": index,
+            "original": (
+                rng.choice(TRIVIAL_TEXTS) if rng.random() < trivial_ratio else synthetic_text(rng)
+            ),
+            "need_to_update": True,
+        }
+        for index in range(count)
+    ]
+    for start in range(0, len(documents), 1000):
+        await collection.insert_many(documents[start : start + 1000])
+
+
+def percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent))]
+
+
+class BenchmarkResult(BaseModel):
+    concurrency: int
+    prompt_batch_size: int
+    items: int
+    seconds: float
+    items_per_second: float
+    p50: float
+    p95: float
+    p99: float
+    tokens_per_item: float
+    skipped: int
+    failed: int
+
+
+class BenchmarkPipeline(TranslationPipeline):
+    """
+    记录每条记录从入队到确认写回的耗时
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.started: Dict[Union[int, str], float] = {}
+        self.latencies: List[float] = []
+
+    async def _skip(self, translation: Translation) -> bool:
+        self.started[translation.id] = time.time()
+        return await super()._skip(translation)
+
+    def _on_flush(self, written: List[Translation], failed: List[Translation]):
+        now = time.time()
+        for translation in written:
+            started = self.started.pop(translation.id, None)
+            if started is not None:
+                self.latencies.append(now - started)
+        super()._on_flush(written, failed)
+
+
+def build_benchmark_providers(base_url: str, concurrency: int) -> Dict[Mode, Provider]:
+    provider = Provider(
+        Mode.UPGRADE,
+        AsyncOpenAI(api_key="benchmark", base_url=base_url, max_retries=0),
+        "benchmark",
+    )
+    # 限流器默认以配置中的 concurrency 为上限，压测时按本轮并发重建
+    provider.limiter = AdaptiveLimiter(provider.name, concurrency)
+    return {Mode.UPGRADE: provider}
+
+
+async def run_benchmark(
+    database: AsyncDatabase,
+    base_url: str,
+    items: int,
+    concurrency: int,
+    prompt_batch_size: int,
+    platform: Platform = Platform.CURSEFORGE,
+    trivial_ratio: float = 0.1,
+) -> BenchmarkResult:
+    await seed(database, platform, items, trivial_ratio)
+    providers = build_benchmark_providers(base_url, concurrency)
+    pipeline = BenchmarkPipeline(
+        platform,
+        database,
+        providers,
+        concurrency=concurrency,
+        prompt_batch_size=prompt_batch_size,
+        chunk_size=max(concurrency * prompt_batch_size, 16),
+        budget=TokenBudget(database, run_limit=None, daily_limit=None),
+    )
+    start_time = time.time()
+    try:
+        result = await pipeline.run()
+    finally:
+        for provider in providers.values():
+            await provider.close()
+    seconds = time.time() - start_time
+    return BenchmarkResult(
+        concurrency=concurrency,
+        prompt_batch_size=prompt_batch_size,
+        items=result.success_count,
+        seconds=round(seconds, 2),
+        items_per_second=round(result.success_count / seconds, 2) if seconds else 0.0,
+        p50=round(percentile(pipeline.latencies, 0.5), 3),
+        p95=round(percentile(pipeline.latencies, 0.95), 3),
+        p99=round(percentile(pipeline.latencies, 0.99), 3),
+        tokens_per_item=result.tokens_per_item,
+        skipped=result.skipped_count,
+        failed=result.failed_count,
+    )
+
+
+async def run_suite(
+    mongodb_uri: str,
+    database_name: str,
+    base_url: str,
+    items: int,
+    concurrency_levels: List[int],
+    batch_sizes: List[int],
+    trivial_ratio: float = 0.1,
+) -> List[BenchmarkResult]:
+    """
+    依次压测每组 (并发, 打包条数)，每组开始前重新写入合成数据
+    """
+    async_engine = AsyncMongoClient(mongodb_uri)
+    results: List[BenchmarkResult] = []
+    try:
+        database = async_engine[database_name]
+        for concurrency in concurrency_levels:
+            for prompt_batch_size in batch_sizes:
+                result = await run_benchmark(
+                    database,
+                    base_url,
+                    items,
+                    concurrency,
+                    prompt_batch_size,
+                    trivial_ratio=trivial_ratio,
+                )
+                log.info(f"Benchmark result: {result.model_dump()}")
+                results.append(result)
+    finally:
+        await async_engine.close()
+    return results
@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+
+from mcim_translate.bench import run_suite
+from mcim_translate.bench.fake_openai import FakeOpenAIServer
+
+COLUMNS = [
+    ("concurrency", "concurrency"),
+    ("prompt_batch_size", "batch"),
+    ("items", "items"),
+    ("items_per_second", "items/s"),
+    ("p50", "p50"),
+    ("p95", "p95"),
+    ("p99", "p99"),
+    ("tokens_per_item", "tokens/item"),
+    ("skipped", "skipped"),
+    ("failed", "failed"),
+]
+
+
+def _int_list(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="使用本地 OpenAI 兼容服务和 MongoDB 离线压测翻译流水线"
+    )
+    parser.add_argument("--mongodb-uri", default="mongodb://127.0.0.1:27017")
+    parser.add_argument("--database", default="mcim_translate_bench")
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--concurrency", type=_int_list, default=[4, 8, 16])
+    parser.add_argument("--batch-sizes", type=_int_list, default=[1, 4])
+    parser.add_argument(
+        "--latency",
+        default="lognormal:0,0.5",
+        help="fixed:秒、uniform:最小,最大、lognormal:mu,sigma、exp:平均值",
+    )
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--trivial-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        latency=args.latency,
+        rate_limit_probability=args.rate_limit_probability,
+        retry_after=args.retry_after,
+    ).start()
+    try:
+        results = asyncio.run(
+            run_suite(
+                args.mongodb_uri,
+                args.database,
+                server.base_url,
+                args.items,
+                args.concurrency,
+                args.batch_sizes,
+                args.trivial_ratio,
+            )
+        )
+    finally:
+        server.stop()
+
+    print(" | ".join(title for _, title in COLUMNS))
+    for result in results:
+        data = result.model_dump()
+        print(" | ".join(str(data[field]) for field, _ in COLUMNS))
+    print(
+        f"fake server: {server.request_count} requests, {server.rate_limited_count} rate limited"
+    )
+
+
+if __name__ == "__main__":
+    main()
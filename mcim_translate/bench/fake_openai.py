@@ -0,0 +1,364 @@
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from mcim_translate.translate.tokens import estimate_messages_tokens, estimate_tokens
+
+# 保留链接、占位符与 Markdown 符号，只把英文单词替换为汉字，保证能通过质量检查
+_KEEP_OR_WORD = re.compile(
+    r"(https?://[\w\-.~:/?#@!$&*+,;=%]+|%(?:\d+\$)?[sdf]|\{\w*\}|§.)|([A-Za-z]+(?:'[A-Za-z]+)?)",
+    re.ASCII,
+)
+
+
+def fake_translate(text: str) -> str:
+    return _KEEP_OR_WORD.sub(lambda m: m.group(1) or "译文", text)
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """
+    延迟分布：fixed:秒、uniform:最小,最大、lognormal:mu,sigma、exp:平均值
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    if kind == "exp":
+        return lambda: random.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeOpenAIServer:
+    """
+    本地 OpenAI 兼容的 /chat/completions 服务，用于离线压测
+
+    - 每次请求按 latency 分布等待，流式响应把等待时间均摊到各个分片
+    - 按 rate_limit_probability 的概率返回 429，附带 Retry-After
+    - 按本地估算返回 usage，支持 json_object 打包翻译和 stream
+    - 提供 /files 与 /batches 批处理接口，批处理任务创建 batch_latency 秒后完成，用于测试批量重译
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: str = "lognormal:0,0.5",
+        rate_limit_probability: float = 0.0,
+        retry_after: float = 1.0,
+        batch_latency: float = 0.0,
+    ):
+        self.latency = parse_latency(latency)
+        self.batch_latency = batch_latency
+        self.files: Dict[str, dict] = {}
+        self.batches: Dict[str, dict] = {}
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, rate_limited: bool):
+        with self._lock:
+            self.request_count += 1
+            self.rate_limited_count += rate_limited
+
+    def _complete(self, body: dict) -> str:
+        content = body["messages"][-1]["content"]
+        if (body.get("response_format") or {}).get("type") == "json_object":
+            texts = json.loads(content)
+            return json.dumps(
+                {key: fake_translate(value) for key, value in texts.items()},
+                ensure_ascii=False,
+            )
+        return fake_translate(content)
+
+    def _usage(self, body: dict, content: str) -> dict:
+        prompt_tokens = estimate_messages_tokens(body["messages"])
+        completion_tokens = estimate_tokens(content)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _create_file(self, content: bytes, filename: str, purpose: str) -> dict:
+        file = {
+            "id": f"file-{uuid.uuid4().hex}",
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        with self._lock:
+            self.files[file["id"]] = {**file, "content": content}
+        return file
+
+    def _create_batch(self, body: dict) -> Optional[dict]:
+        if body.get("input_file_id") not in self.files:
+            return None
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex}",
+            "object": "batch",
+            "endpoint": body["endpoint"],
+            "completion_window": body.get("completion_window", "24h"),
+            "input_file_id": body["input_file_id"],
+            "status": "in_progress",
+            "created_at": int(time.time()),
+            "metadata": body.get("metadata"),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self._lock:
+            self.batches[batch["id"]] = batch
+        return batch
+
+    def _retrieve_batch(self, batch_id: str) -> Optional[dict]:
+        """
+        到期后在查询时生成结果文件，不需要后台线程
+        """
+        with self._lock:
+            batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        if batch["status"] != "in_progress" or time.time() < batch["created_at"] + self.batch_latency:
+            return batch
+        lines = []
+        for line in self.files[batch["input_file_id"]]["content"].decode().splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            body = request["body"]
+            content = self._complete(body)
+            lines.append(
+                json.dumps(
+                    {
+                        "id": f"batch_req_{uuid.uuid4().hex}",
+                        "custom_id": request["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "request_id": uuid.uuid4().hex,
+                            "body": {
+                                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                                "object": "chat.completion",
+                                "created": int(time.time()),
+                                "model": body["model"],
+                                "choices": [
+                                    {
+                                        "index": 0,
+                                        "message": {"role": "assistant", "content": content},
+                                        "finish_reason": "stop",
+                                    }
+                                ],
+                                "usage": self._usage(body, content),
+                            },
+                        },
+                        "error": None,
+                    },
+                    ensure_ascii=False,
+                )
+            )
+        output = self._create_file(
+            ("\n".join(lines) + "\n").encode(), f"{batch_id}_output.jsonl", "batch_output"
+        )
+        batch.update(
+            status="completed",
+            output_file_id=output["id"],
+            completed_at=int(time.time()),
+            request_counts={"total": len(lines), "completed": len(lines), "failed": 0},
+        )
+        return batch
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, data: dict, headers: Optional[dict] = None):
+                payload = json.dumps(data, ensure_ascii=False).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_chunk(self, data: dict):
+                payload = f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+                self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+
+            def _not_found(self):
+                self._send_json(404, {"error": {"message": "not found"}})
+
+            def _upload_file(self, raw: bytes):
+                message = BytesParser(policy=default_policy).parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw
+                )
+                fields = {}
+                filename = "upload.jsonl"
+                for part in message.iter_parts():
+                    name = part.get_param("name", header="content-disposition")
+                    fields[name] = part.get_payload(decode=True)
+                    if name == "file":
+                        filename = part.get_filename() or filename
+                file = server._create_file(
+                    fields.get("file", b""), filename, (fields.get("purpose") or b"batch").decode()
+                )
+                self._send_json(200, file)
+
+            def do_GET(self):
+                parts = self.path.rstrip("/").split("/")
+                if len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+                    file = server.files.get(parts[-2])
+                    if file is None:
+                        self._not_found()
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/jsonl")
+                    self.send_header("Content-Length", str(len(file["content"])))
+                    self.end_headers()
+                    self.wfile.write(file["content"])
+                elif len(parts) >= 2 and parts[-2] == "batches":
+                    batch = server._retrieve_batch(parts[-1])
+                    if batch is None:
+                        self._not_found()
+                    else:
+                        self._send_json(200, batch)
+                else:
+                    self._not_found()
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers["Content-Length"]))
+                if self.path.endswith("/files"):
+                    self._upload_file(raw)
+                    return
+                body = json.loads(raw)
+                if self.path.endswith("/batches"):
+                    batch = server._create_batch(body)
+                    if batch is None:
+                        self._send_json(400, {"error": {"message": "input file not found"}})
+                    else:
+                        self._send_json(200, batch)
+                    return
+                if not self.path.endswith("/chat/completions"):
+                    self._not_found()
+                    return
+                if random.random() < server.rate_limit_probability:
+                    server._count(True)
+                    self._send_json(
+                        429,
+                        {"error": {"message": "rate limited", "type": "rate_limit_error"}},
+                        {"Retry-After": str(server.retry_after)},
+                    )
+                    return
+                server._count(False)
+
+                latency = server.latency()
+                content = server._complete(body)
+                usage = server._usage(body, content)
+                base = {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "created": int(time.time()),
+                    "model": body["model"],
+                }
+                if not body.get("stream"):
+                    time.sleep(latency)
+                    self._send_json(
+                        200,
+                        {
+                            **base,
+                            "object": "chat.completion",
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "message": {"role": "assistant", "content": content},
+                                    "finish_reason": "stop",
+                                }
+                            ],
+                            "usage": usage,
+                        },
+                    )
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                pieces = [content[i : i + 8] for i in range(0, len(content), 8)] or [""]
+                for piece in pieces:
+                    time.sleep(latency / len(pieces))
+                    self._send_chunk(
+                        {
+                            **base,
+                            "object": "chat.completion.chunk",
+                            "choices": [
+                                {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+                            ],
+                        }
+                    )
+                self._send_chunk(
+                    {**base, "object": "chat.completion.chunk", "choices": [], "usage": usage}
+                )
+                payload = b"data: [DONE]\n\n"
+                self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n0\r\n\r\n")
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="本地 OpenAI 兼容服务，把 translate.base_url 或 migrate.base_url 指向它离线测试"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", default="fixed:0")
+    parser.add_argument("--batch-latency", type=float, default=5.0)
+    args = parser.parse_args()
+    server = FakeOpenAIServer(
+        args.host, args.port, args.latency, batch_latency=args.batch_latency
+    )
+    print(f"Serving fake OpenAI API at {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+from typing import List, Optional, Sequence, Union
+import argparse
+import asyncio
+import os
+
+from mcim_translate.pipeline import PipelineResult
+from mcim_translate.pipeline.scheduler import run_scheduled
+from mcim_translate.watch import run_watch_mode
+from mcim_translate.export import WRITERS, run_export
+from mcim_translate.migrate import run_cutover, run_migration
+from mcim_translate.config import CONFIG_PATH, Config
+from mcim_translate.logger import log
+from mcim_translate.constants import Platform
+from mcim_translate.telegram import notifier, send_result
+from mcim_translate.metrics import start_metrics_server
+
+PLATFORMS = {platform.value.lower(): platform for platform in Platform}
+
+
+def report_result(result: PipelineResult):
+    platform = result.platform
+    log.info(
+        f"Translation memory hit rate {result.memory_hit_rate}: "
+        f"{result.memory_lru_hits} lru hits, {result.memory_db_hits} db hits, {result.memory_misses} misses."
+    )
+    log.info(
+        f"Totally Translated {result.success_count} {platform.value} projects, failed {result.failed_count}, used {result.total_used_token} tokens."
+    )
+    if len(result.translated_ids) > 0:
+        send_result(platform, result.translated_ids)
+        log.info(f"{platform.value} translation check completed.")
+
+
+async def send_watch_result(platform: Platform, translated_ids: List[Union[int, str]]):
+    log.info(f"Translated {len(translated_ids)} {platform.value} items since last report.")
+    # 只放入通知队列，不阻塞事件循环
+    send_result(platform, translated_ids)
+
+
+def run_watch():
+    log.info("Starting change stream translation mode...")
+    try:
+        asyncio.run(run_watch_mode(on_idle=send_watch_result))
+    except (KeyboardInterrupt, SystemExit):
+        log.info("Shutting down...")
+    finally:
+        notifier.close()
+
+
+def run_scheduler(platforms: Sequence[Platform] = tuple(Platform), once: bool = False):
+    """
+    所有平台共用一个调度器：共享翻译并发、token 预算和内存上限，各平台按自己的 cron 扫描
+    """
+    log.info("Scheduler started")
+    try:
+        asyncio.run(run_scheduled(platforms, on_result=report_result, once=once))
+    except (KeyboardInterrupt, SystemExit):
+        log.info("Shutting down...")
+    finally:
+        notifier.close()
+
+
+def serve():
+    """
+    常驻运行：按配置选择 change stream 持续翻译或定时任务
+    """
+    start_metrics_server()
+    if Config.load().watch.enable:
+        run_watch()
+    else:
+        run_scheduler()
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m mcim_translate")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="翻译指定平台")
+    run_parser.add_argument(
+        "--platform", choices=sorted(PLATFORMS), help="默认翻译所有平台"
+    )
+    run_parser.add_argument(
+        "--once", action="store_true", help="翻译完当前待翻译记录后退出，适用于 CronJob"
+    )
+    subparsers.add_parser("watch", help="监听 change stream 持续翻译")
+
+    export_parser = subparsers.add_parser("export", help="流式导出已翻译的记录")
+    export_parser.add_argument(
+        "--platform", choices=sorted(PLATFORMS), help="默认导出所有平台"
+    )
+    export_parser.add_argument("--format", choices=sorted(WRITERS))
+    export_parser.add_argument("--output", help="导出目录")
+    export_parser.add_argument(
+        "--incremental", action="store_true", help="只导出上次导出之后翻译的记录"
+    )
+
+    migrate_parser = subparsers.add_parser(
+        "migrate", help="通过批处理接口重译所有不是由指定模型翻译的记录"
+    )
+    migrate_parser.add_argument(
+        "--platform", choices=sorted(PLATFORMS), help="默认重译所有平台"
+    )
+    migrate_parser.add_argument("--model", help="默认为 migrate.model 或 translate.model")
+    migrate_parser.add_argument(
+        "--run", help="进度记录的名称，默认为模型名；以相同的名称重新运行会从中断处继续"
+    )
+    migrate_parser.add_argument(
+        "--shadow",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="新译文写入 shadow 字段而不覆盖当前译文，默认为 migrate.shadow",
+    )
+    migrate_parser.add_argument(
+        "--cutover", action="store_true", help="用通过质量检查的 shadow 译文替换当前译文"
+    )
+
+    config_parser = subparsers.add_parser("config", help="生成默认配置文件")
+    config_parser.add_argument("--output", default=CONFIG_PATH, help=f"默认为 {CONFIG_PATH}")
+    config_parser.add_argument(
+        "--force", action="store_true", help="覆盖已存在的配置文件"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == "config":
+        if os.path.exists(args.output) and not args.force:
+            parser.error(f"{args.output} already exists, use --force to overwrite.")
+        Config.save(target=args.output)
+        log.info(f"Default config written to {args.output}.")
+    elif args.command == "run":
+        platforms = [PLATFORMS[args.platform]] if args.platform else list(Platform)
+        if not args.once:
+            start_metrics_server()
+        run_scheduler(platforms, once=args.once)
+    elif args.command == "watch":
+        start_metrics_server()
+        run_watch()
+    elif args.command == "export":
+        export_config = Config.load().export
+        platforms = [PLATFORMS[args.platform]] if args.platform else list(Platform)
+        asyncio.run(
+            run_export(
+                platforms,
+                args.output or export_config.path,
+                args.format or export_config.format,
+                args.incremental,
+            )
+        )
+    elif args.command == "migrate":
+        platforms = [PLATFORMS[args.platform]] if args.platform else list(Platform)
+        if args.cutover:
+            asyncio.run(run_cutover(platforms, args.model))
+        else:
+            shadow = Config.load().migrate.shadow if args.shadow is None else args.shadow
+            asyncio.run(run_migration(platforms, args.model, args.run, shadow))
+    else:
+        serve()
@@ -1,6 +1,6 @@
 import json
 import os
-from typing import Optional
+from typing import Dict, Optional
 from pydantic import BaseModel
 
 CONFIG_PATH = "config.json"
@@ -13,6 +13,40 @@ class MongodbConfigModel(BaseModel):
     password: str = "password"
     database: str = "database"
 
+class RateLimit(BaseModel):
+    min_concurrency: int = 1  # 自适应并发的下限
+    initial_concurrency: Optional[int] = None  # 初始并发，默认为 concurrency
+    latency_target: float = 30  # 延迟超过该秒数时不再增加并发
+    decrease_factor: float = 0.5  # 遇到 429 时并发乘以该系数
+    default_retry_after: float = 5  # 429 没有 Retry-After 时暂停的秒数
+    max_retries: int = 3  # 遇到 429 时的重试次数
+    rpm: Optional[int] = None  # 主模型每分钟请求数上限
+    tpm: Optional[int] = None  # 主模型每分钟 token 数上限
+    backup_rpm: Optional[int] = None
+    backup_tpm: Optional[int] = None
+
+class Router(BaseModel):
+    hedge: bool = True  # 请求超过 p95 延迟时向另一个后端发送对冲请求
+    hedge_after: float = 20  # 延迟样本不足时的对冲等待秒数
+    hedge_min_samples: int = 20  # 计算 p95 所需的最少样本数
+    window: int = 100  # 健康统计的请求窗口
+    error_penalty: float = 4  # 错误率对健康分的惩罚系数
+    preferred_bias: float = 0.8  # 首选后端的健康分系数，越小越倾向首选后端
+
+class Record(BaseModel):
+    mode: Optional[str] = None  # "record" 录制 LLM 请求，"replay" 不访问网络回放录制的响应
+    path: str = "llm_record.jsonl.gz"  # 录制文件
+    speed: float = 1.0  # 回放时按原始耗时除以该值等待，0 为不等待
+
+class Quality(BaseModel):
+    enable: bool = True  # 写回前检查译文质量，不合格的重试
+    min_length: int = 20  # 原文字母数达到该值才检查长度比与汉字比例
+    min_length_ratio: float = 0.15  # 译文与原文的最小长度比
+    max_length_ratio: float = 3.0  # 译文与原文的最大长度比
+    min_target_ratio: float = 0.3  # 译文中汉字占字母的最低比例
+    untranslated_words: int = 6  # 原样出现在译文中视为未翻译的最少单词数
+    retries: int = 1  # 不合格时使用更严格的提示词重试的次数
+
 class Translate(BaseModel):
     api_key: str = "<api key>"
     base_url: str = "https://api.deepseek.com"
@@ -23,30 +57,143 @@ class Translate(BaseModel):
     backup_base_url: Optional[str] = None
     temperature: float = 0.6
     target_language: str = "中文"
-    chunk_size: int = 2
-    multiprocess: bool = False
+    chunk_size: int = 2  # 每次从数据库读取的记录数
+    concurrency: int = 8  # 同时进行的 LLM 请求数
+    queue_size: int = 64  # 流水线各阶段之间的队列长度
+    prompt_batch_size: int = 1  # 单次请求打包翻译的简介数，1 为逐条翻译
+    max_batch_tokens: int = 2000  # 打包翻译时单次请求的估算 token 上限
+    run_token_budget: Optional[int] = None  # 单次运行的 token 预算
+    daily_token_budget: Optional[int] = None  # 每日 token 预算
+    skip_filter: bool = True  # 空白、已是中文、纯链接、纯版本号等文本不经过 LLM 直接写回
+    skip_chinese_ratio: float = 0.5  # 汉字占字母的比例达到该值视为已是中文
+    skip_max_name_length: int = 40  # 不超过该长度的单个词视为模组名称
+    enable_memory: bool = True  # 相同原文复用已有译文
+    memory_size: int = 10000  # 翻译记忆进程内 LRU 容量
+    glossary_path: Optional[str] = "translation_table.json"  # 原版物品译名表
+    glossary_max_terms: int = 30  # 单次请求最多注入的术语数
+    write_batch_size: int = 100  # 攒够多少条译文批量写回
+    write_flush_interval: float = 5.0  # 最长多少秒写回一次
+    write_retries: int = 3  # 译文写回失败后在下次写入时重试的次数，用完后留在本地日志中等待重启时重放
+    count_refresh_interval: float = 300  # 剩余数量重新统计的间隔秒数，期间按写回数递减
+    timeout: float = 60  # 单次请求超时秒数
+    stream: bool = True  # 流式接收译文，输出失控时提前中断
+    stream_output_ratio: float = 3  # 输出 token 超过原文估算 token 的倍数时中断
+    stream_min_output_tokens: int = 128  # 输出 token 上限的最小值
+    stream_retries: int = 1  # 输出被中断后的重试次数
+    rate_limit: RateLimit = RateLimit()
+    router: Router = Router()
+    quality: Quality = Quality()
+    record: Record = Record()
     # enable_thinking: bool = False
     # thinking_budget: int = 256
     extra_body: Optional[dict] = None
     reasoning_effort: Optional[str] = "low"  # "low", "medium", "high", "xhigh"
 
+class Lease(BaseModel):
+    worker_id: Optional[str] = None  # 默认为 主机名-进程号
+    lease_seconds: int = 600  # 领取的记录超过该时间未写回可被其他 worker 重新领取
+    max_failures: int = 5  # 连续失败次数达到后视为毒数据
+    retry_backoff: int = 300  # 失败后重试的基础退避秒数，按失败次数指数增长
+    poison_backoff: int = 3600 * 24 * 7  # 毒数据的退避秒数
+
+class Journal(BaseModel):
+    enable: bool = True  # 写回前先把译文记录到本地日志，崩溃后启动时重放
+    path: str = "journal"  # 日志目录，每个进程需要单独的目录
+    segment_bytes: int = 16 * 1024 * 1024  # 单个分段文件的大小上限
+    fsync_batch: int = 32  # 每追加多少条 fsync 一次
+    fsync_interval: float = 1.0  # 最长多少秒 fsync 一次
+
+class Priority(BaseModel):
+    enable: bool = True  # 按下载量和更新时间优先翻译热门模组
+    downloads_weight: float = 1.0  # log10(下载量 + 1) 的权重
+    recency_weight: float = 3.0  # 更新时间新近程度的权重
+    half_life_days: float = 180  # 距上次更新每过该天数，新近程度减半
+    refresh_interval: float = 86400  # 全量重新计算 priority 的间隔秒数，期间每轮扫描只计算还没有 priority 的记录
+    curseforge_collection: str = "curseforge_mods"
+    curseforge_downloads_field: str = "downloadCount"
+    curseforge_updated_field: str = "dateModified"
+    modrinth_collection: str = "modrinth_projects"
+    modrinth_downloads_field: str = "downloads"
+    modrinth_updated_field: str = "updated"
+
+class PlatformSchedule(BaseModel):
+    weight: float = 1.0  # 两个平台同时有待翻译记录时，按估算 token 分配翻译并发的权重
+    cron: Optional[str] = None  # 默认为 curseforge_cron / modrinth_cron
+    queue_size: int = 32  # 在共享队列中最多排队的记录数
+
+class Scheduler(BaseModel):
+    concurrency: Optional[int] = None  # 所有平台共享的翻译 worker 数，默认为 translate.concurrency
+    max_queue_bytes: int = 8 * 1024 * 1024  # 共享队列中原文占用的内存上限
+    max_rss_mb: Optional[int] = 160  # 进程常驻内存超过该值时暂停领取新记录
+    curseforge: PlatformSchedule = PlatformSchedule()
+    modrinth: PlatformSchedule = PlatformSchedule()
+
+class Watch(BaseModel):
+    enable: bool = False  # 监听 change stream 持续翻译，代替定时任务
+    debounce: float = 5  # 收到变更后等待多少秒没有新变更再开始翻译
+    debounce_max: float = 60  # 收到变更后最多等待的秒数
+    poll_interval: float = 60  # 不支持 change stream 时轮询的间隔秒数
+    rescan_interval: float = 600  # 没有变更时也定期重新扫描，领取写回失败、退避到期和租约过期的记录
+    resume_token_interval: float = 5  # 保存 resume token 的最小间隔秒数
+
+class Export(BaseModel):
+    path: str = "exports"  # 导出目录
+    format: str = "jsonl"  # "jsonl"（gzip 压缩）或 "parquet"（需要 pyarrow）
+    batch_size: int = 1000  # 游标每批读取和写入的记录数
+    lag: float = 60  # 增量导出的截止时间比当前时间早的秒数
+
+class Migrate(BaseModel):
+    model: Optional[str] = None  # 批量重译使用的模型，默认为 translate.model
+    api_key: Optional[str] = None  # 提供 /batches 的后端，默认为 translate.api_key
+    base_url: Optional[str] = None  # 默认为 translate.base_url
+    shadow: bool = True  # 新译文写入 shadow_field 供对比，确认后再用 --cutover 替换当前译文
+    shadow_field: str = "shadow"
+    path: str = "migrate"  # 批处理输入文件的保存目录
+    requests_per_batch: int = 5000  # 单个批处理任务的请求数
+    max_batch_bytes: int = 100 * 1024 * 1024  # 单个批处理输入文件的大小上限
+    max_active_batches: int = 4  # 同时提交的批处理任务数
+    max_batch_retries: int = 2  # 失败或只有部分结果的任务按原区间重新提交的次数
+    completion_window: str = "24h"
+    poll_interval: float = 60  # 查询批处理状态的间隔秒数
+
+class Metrics(BaseModel):
+    enable: bool = True  # 提供 Prometheus /metrics
+    host: str = "0.0.0.0"
+    port: int = 9108
+
 class Telegram(BaseModel):
     enable: bool = False
     bot_api: str = "https://api.telegram.org/bot"
     bot_token: str = "<bot token>"
     chat_id: str = "<chat id>"
+    coalesce_interval: float = 30  # 收到结果后等待多少秒，合并这段时间内的结果一起发送
+    min_interval: float = 3  # 两条消息之间的最小间隔秒数，群组每分钟最多 20 条
+    max_retries: int = 5  # 单条消息最多尝试次数，超过后放弃
+    timeout: float = 10  # 单次请求超时秒数
+    flush_timeout: float = 30  # 退出时最多等待多少秒发送剩余消息
 
 # 合并配置模型，将三个配置嵌套在一起
 class ConfigModel(BaseModel):
     debug: bool = False
     mongodb: MongodbConfigModel = MongodbConfigModel()
     translate: Translate = Translate()
+    lease: Lease = Lease()
+    journal: Journal = Journal()
+    priority: Priority = Priority()
+    scheduler: Scheduler = Scheduler()
+    watch: Watch = Watch()
+    metrics: Metrics = Metrics()
+    export: Export = Export()
+    migrate: Migrate = Migrate()
     telegram: Telegram = Telegram()
     interval: int = 3600 * 24
     curseforge_cron: str = "0 0 * * *"
     modrinth_cron: str = "0 0 * * *"
 
 class Config:
+    # 每个配置文件只读取、校验一次，各模块共享同一个实例
+    _loaded: Dict[str, ConfigModel] = {}
+
     @staticmethod
     def save(model: ConfigModel = ConfigModel(), target=CONFIG_PATH):
         with open(target, "w", encoding="UTF-8") as fd:
@@ -54,8 +201,14 @@ class Config:
 
     @staticmethod
     def load(target=CONFIG_PATH) -> ConfigModel:
+        if target not in Config._loaded:
+            Config._loaded[target] = Config._read(target)
+        return Config._loaded[target]
+
+    @staticmethod
+    def _read(target: str) -> ConfigModel:
         if not os.path.exists(target):
-            Config.save(target=target)
+            # 只读取配置，不在导入时生成文件；需要时用 `python -m mcim_translate config` 生成
             return ConfigModel()
         with open(target, "r", encoding="UTF-8") as fd:
             data = json.load(fd)
@@ -1,9 +1,20 @@
 from mcim_translate.database.mongodb import (
     init_engine,
-    database
+    init_async_engine,
+    get_async_database,
 )
 
 __all__ = [
     "init_engine",
-    "database"
-]
\ No newline at end of file
+    "init_async_engine",
+    "get_async_database",
+]
+
+
+def __getattr__(name: str):
+    # 同步数据库连接在访问时才创建
+    if name == "database":
+        from mcim_translate.database import mongodb
+
+        return mongodb.database
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
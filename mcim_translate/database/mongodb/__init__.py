@@ -1,28 +1,53 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, AsyncMongoClient
+from pymongo.asynchronous.database import AsyncDatabase
+from typing import Optional
 
 from mcim_translate.config import Config
 from mcim_translate.logger import log
 
 _mongodb_config = Config.load().mongodb
 
-engine: MongoClient = None
+engine: Optional[MongoClient] = None
 
+# 保存运行状态（resume token、token 用量等）的集合
+STATE_COLLECTION = "translate_state"
 
-def init_engine() -> MongoClient:
-    """
-    Raw Motor client handler, use it when beanie cannot work
-    :return:
-    """
-    global engine
-    engine = MongoClient(
+# 保存批量重译任务进度的集合
+BATCH_COLLECTION = "translate_batches"
+
+
+def _mongodb_uri() -> str:
+    return (
         f"mongodb://{_mongodb_config.user}:{_mongodb_config.password}@{_mongodb_config.host}:{_mongodb_config.port}"
         if _mongodb_config.auth
         else f"mongodb://{_mongodb_config.host}:{_mongodb_config.port}"
     )
+
+
+def init_engine() -> MongoClient:
+    """
+    同步客户端，首次调用时才创建连接
+    """
+    global engine
+    if engine is None:
+        engine = MongoClient(_mongodb_uri())
+        log.info("MongoDB connection established.")
     return engine
 
 
-engine: MongoClient = init_engine()
-database = engine[_mongodb_config.database]
+def init_async_engine() -> AsyncMongoClient:
+    """
+    异步客户端绑定在创建它的事件循环上，每个事件循环需要单独创建，用完后调用 close()
+    """
+    return AsyncMongoClient(_mongodb_uri())
+
+
+def get_async_database(async_engine: AsyncMongoClient) -> AsyncDatabase:
+    return async_engine[_mongodb_config.database]
+
 
-log.info("MongoDB connection established.")
\ No newline at end of file
+def __getattr__(name: str):
+    # 兼容 from mcim_translate.database.mongodb import database，访问时才连接
+    if name == "database":
+        return init_engine()[_mongodb_config.database]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,60 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.asynchronous.database import AsyncDatabase
+
+from mcim_translate.logger import log
+
+TRANSLATED_COLLECTIONS = ["curseforge_translated", "modrinth_translated"]
+
+# 只索引待翻译的记录，领取查询和剩余数量统计都走这个索引
+NEED_TO_UPDATE_INDEX = "need_to_update_partial"
+# 按优先级领取待翻译记录
+PRIORITY_INDEX = "need_to_update_priority"
+# 领取查询按租约过期时间过滤
+LEASE_INDEX = "need_to_update_lease_expires_at"
+# 增量导出按 translated_at 查询
+TRANSLATED_AT_INDEX = "translated_at"
+# 已不再使用的索引，启动时删除；(claimed_by, lease_expires_at) 的首字段不在领取查询中，用不上
+OBSOLETE_INDEXES = ["lease"]
+
+TRANSLATED_INDEXES = [
+    IndexModel(
+        [("need_to_update", ASCENDING), ("_id", ASCENDING)],
+        name=NEED_TO_UPDATE_INDEX,
+        partialFilterExpression={"need_to_update": True},
+    ),
+    IndexModel(
+        [("priority", DESCENDING), ("_id", ASCENDING)],
+        name=PRIORITY_INDEX,
+        partialFilterExpression={"need_to_update": True},
+    ),
+    IndexModel(
+        [("lease_expires_at", ASCENDING)],
+        name=LEASE_INDEX,
+        partialFilterExpression={"need_to_update": True},
+    ),
+    IndexModel(
+        [("retry_after", ASCENDING)],
+        name="retry_after",
+        sparse=True,
+    ),
+    IndexModel(
+        [("translated_at", ASCENDING)],
+        name=TRANSLATED_AT_INDEX,
+        sparse=True,
+    ),
+]
+
+
+async def ensure_indexes(database: AsyncDatabase):
+    """
+    创建翻译集合所需的索引，已存在的索引不会重复创建，并删除不再使用的索引
+    """
+    for collection_name in TRANSLATED_COLLECTIONS:
+        collection = database.get_collection(collection_name)
+        existing = await collection.index_information()
+        for name in OBSOLETE_INDEXES:
+            if name in existing:
+                await collection.drop_index(name)
+                log.info(f"Dropped obsolete index {name} on {collection_name}.")
+        names = await collection.create_indexes(TRANSLATED_INDEXES)
+        log.debug(f"Ensured indexes {names} on {collection_name}.")
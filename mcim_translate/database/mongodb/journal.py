@@ -0,0 +1,172 @@
+from pymongo import UpdateOne
+from pymongo.asynchronous.database import AsyncDatabase
+from pydantic import ValidationError
+from typing import Dict, IO, List, Optional
+import asyncio
+import os
+import time
+
+from mcim_translate.translate import (
+    Translation,
+    build_translation_update,
+    translated_collection_name,
+)
+from mcim_translate.config import Config
+from mcim_translate.logger import log
+
+journal_config = Config.load().journal
+
+SEGMENT_SUFFIX = ".jsonl"
+
+
+def _entry_key(translation: Translation) -> tuple:
+    return translation.platform.value, translation.id, translation.lease_id
+
+
+class TranslationJournal:
+    """
+    已完成译文的本地预写日志
+
+    - 每条译文在写回数据库之前追加到分段文件，每条写入后 flush 到系统缓存，每 fsync_batch 条或 fsync_interval 秒 fsync 一次
+    - 数据库确认写入后通过 confirm() 标记，分段内的记录全部确认后删除该分段
+    - 启动时 replay() 把遗留的记录写回数据库，确认后删除，进程崩溃或数据库写入失败都不会重复消耗 token
+    """
+
+    def __init__(
+        self,
+        path: str = journal_config.path,
+        segment_bytes: int = journal_config.segment_bytes,
+        fsync_batch: int = journal_config.fsync_batch,
+        fsync_interval: float = journal_config.fsync_interval,
+    ):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.fsync_batch = max(1, fsync_batch)
+        self.fsync_interval = fsync_interval
+        self._file: Optional[IO[str]] = None
+        self._segment: Optional[int] = None
+        # 分段序号 -> 未确认的记录数
+        self._outstanding: Dict[int, int] = {}
+        self._entries: Dict[tuple, int] = {}
+        self._unsynced = 0
+        self._synced_at = time.time()
+        self._lock = asyncio.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f"{segment:08d}{SEGMENT_SUFFIX}")
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(name[: -len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.path)
+            if name.endswith(SEGMENT_SUFFIX) and name[: -len(SEGMENT_SUFFIX)].isdigit()
+        )
+
+    def _open_segment(self):
+        segments = self._segments()
+        self._segment = segments[-1] + 1 if segments else 0
+        self._file = open(self._segment_path(self._segment), "a", encoding="UTF-8")
+        self._outstanding[self._segment] = 0
+
+    async def _sync(self):
+        if self._file is None or not self._unsynced:
+            return
+        await asyncio.to_thread(os.fsync, self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.time()
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._segment = None
+
+    def _remove_segment(self, segment: int):
+        if segment == self._segment:
+            self._close_segment()
+        self._outstanding.pop(segment, None)
+        try:
+            os.remove(self._segment_path(segment))
+        except FileNotFoundError:
+            pass
+
+    async def append(self, translation: Translation):
+        async with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(translation.model_dump_json() + "\n")
+            self._file.flush()
+            self._entries[_entry_key(translation)] = self._segment
+            self._outstanding[self._segment] += 1
+            self._unsynced += 1
+            if (
+                self._unsynced >= self.fsync_batch
+                or time.time() - self._synced_at >= self.fsync_interval
+            ):
+                await self._sync()
+            if self._file.tell() >= self.segment_bytes:
+                await self._sync()
+                self._close_segment()
+
+    def confirm(self, translations: List[Translation]):
+        """
+        标记已写入数据库的译文，删除全部确认的分段
+
+        正在 fsync 的分段中至少有一条刚追加、尚未写回的记录，不会在此被删除
+        """
+        for translation in translations:
+            segment = self._entries.pop(_entry_key(translation), None)
+            if segment is None:
+                continue
+            self._outstanding[segment] -= 1
+            if self._outstanding[segment] == 0:
+                self._remove_segment(segment)
+
+    async def close(self):
+        async with self._lock:
+            await self._sync()
+            self._close_segment()
+
+    def _read_segment(self, segment: int) -> List[Translation]:
+        translations: List[Translation] = []
+        with open(self._segment_path(segment), "r", encoding="UTF-8") as fd:
+            for line in fd:
+                if not line.strip():
+                    continue
+                try:
+                    translations.append(Translation.model_validate_json(line))
+                except ValidationError:
+                    # 崩溃时最后一行可能只写了一半
+                    log.warning(f"Skipping corrupt journal entry in segment {segment}.")
+        return translations
+
+    async def replay(self, database: AsyncDatabase) -> int:
+        """
+        写回上次运行遗留的译文，全部写入后删除对应分段，返回写回的记录数
+        """
+        async with self._lock:
+            segments = [s for s in self._segments() if s not in self._outstanding]
+            if not segments:
+                return 0
+            latest: Dict[tuple, Translation] = {}
+            for segment in segments:
+                for translation in self._read_segment(segment):
+                    latest[(translation.platform.value, translation.id)] = translation
+
+            operations: Dict[str, List[UpdateOne]] = {}
+            for translation in latest.values():
+                operations.setdefault(
+                    translated_collection_name(translation.platform), []
+                ).append(build_translation_update(translation))
+            for collection_name, collection_operations in operations.items():
+                # 失败时保留分段，下次启动再重放
+                await database.get_collection(collection_name).bulk_write(
+                    collection_operations, ordered=False
+                )
+            for segment in segments:
+                self._remove_segment(segment)
+            log.info(
+                f"Replayed {len(latest)} journaled translations from {len(segments)} segments."
+            )
+            return len(latest)
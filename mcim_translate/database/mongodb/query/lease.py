@@ -0,0 +1,146 @@
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.asynchronous.database import AsyncDatabase
+from typing import Any, List, Optional
+from datetime import datetime, timedelta
+import os
+import socket
+import time
+import uuid
+
+from mcim_translate.translate import Translation
+from mcim_translate.constants import Platform
+from mcim_translate.config import Config
+from mcim_translate.logger import log
+
+lease_config = Config.load().lease
+priority_config = Config.load().priority
+
+WORKER_ID = lease_config.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+
+LEASE_FIELDS = ["claimed_by", "lease_id", "lease_expires_at"]
+
+
+def claimable_query(now: datetime) -> dict:
+    """
+    待翻译、未被领取（或租约已过期）且不在退避期内的记录
+    """
+    return {
+        "need_to_update": True,
+        "$and": [
+            {"$or": [{"lease_expires_at": None}, {"lease_expires_at": {"$lt": now}}]},
+            {"$or": [{"retry_after": None}, {"retry_after": {"$lt": now}}]},
+        ],
+    }
+
+
+def _after_priority_query(priority: Optional[float], last_id: Any) -> List[dict]:
+    """
+    (priority 降序, _id 升序) 的键集分页条件，没有 priority 的记录排在最后
+    """
+    if priority is None:
+        return [{"priority": None, "_id": {"$gt": last_id}}]
+    return [
+        {"priority": {"$lt": priority}},
+        {"priority": priority, "_id": {"$gt": last_id}},
+        {"priority": None},
+    ]
+
+
+async def claim_translations(
+    database: AsyncDatabase,
+    collection_name: str,
+    platform: Platform,
+    batch_size: int,
+    after_id: Optional[Any] = None,
+    worker_id: str = WORKER_ID,
+    by_priority: bool = priority_config.enable,
+) -> tuple[List[Translation], Optional[Any]]:
+    """
+    分页领取待翻译记录，by_priority 时按 (priority 降序, _id) 排序，否则按 _id 排序
+
+    先读出候选 _id，再用带领取条件的 update_many 原子地写入租约，最后读回本次租约拿到的记录。
+    返回 (领取到的记录, 本页的分页位置)，分页位置作为下一页的 after_id 传入；
+    候选被其他 worker 抢走时领取到的记录可能少于候选数
+    """
+    start_time = time.time()
+    collection = database.get_collection(collection_name)
+    now = datetime.now()
+    query = claimable_query(now)
+    if by_priority:
+        if after_id is not None:
+            query["$or"] = _after_priority_query(*after_id)
+        cursor = collection.find(query, {"_id": 1, "priority": 1}).sort(
+            [("priority", DESCENDING), ("_id", ASCENDING)]
+        )
+    else:
+        if after_id is not None:
+            query["_id"] = {"$gt": after_id}
+        cursor = collection.find(query, {"_id": 1}).sort("_id", ASCENDING)
+
+    candidates = [doc async for doc in cursor.limit(batch_size)]
+    if not candidates:
+        return [], None
+    candidate_ids = [doc["_id"] for doc in candidates]
+    last = candidates[-1]
+    position = (last.get("priority"), last["_id"]) if by_priority else last["_id"]
+
+    lease_id = uuid.uuid4().hex
+    claim_query = claimable_query(now)
+    claim_query["_id"] = {"$in": candidate_ids}
+    await collection.update_many(
+        claim_query,
+        {
+            "$set": {
+                "claimed_by": worker_id,
+                "lease_id": lease_id,
+                "lease_expires_at": now + timedelta(seconds=lease_config.lease_seconds),
+            }
+        },
+    )
+
+    results: List[Translation] = []
+    async for doc in collection.find(
+        {"_id": {"$in": candidate_ids}, "lease_id": lease_id},
+        {"_id": 1, "original": 1, "segments": 1, "failed_count": 1},
+    ).sort("_id", 1):
+        results.append(
+            Translation(
+                platform=platform,
+                id=doc["_id"],
+                original_text=doc["original"],
+                translated_text=None,
+                previous_segments=doc.get("segments"),
+                lease_id=lease_id,
+                failed_count=doc.get("failed_count", 0),
+            )
+        )
+
+    log.debug(
+        f"Claimed {len(results)} of {len(candidate_ids)} {platform.value} records in {round(time.time() - start_time, 2)} seconds."
+    )
+    return results, position
+
+
+def build_failure_update(translation: Translation) -> UpdateOne:
+    """
+    释放失败记录的租约，失败次数加一并按指数退避，达到 max_failures 后按 poison_backoff 退避
+    """
+    failed_count = translation.failed_count + 1
+    if failed_count >= lease_config.max_failures:
+        backoff = lease_config.poison_backoff
+        log.warning(
+            f"{translation.platform.value} {translation.id} failed {failed_count} times, backing off for {backoff} seconds."
+        )
+    else:
+        backoff = lease_config.retry_backoff * 2 ** (failed_count - 1)
+    update = {
+        "$set": {
+            "failed_count": failed_count,
+            "retry_after": datetime.now() + timedelta(seconds=backoff),
+        },
+        "$unset": {field: "" for field in LEASE_FIELDS},
+    }
+    if translation.quality_issues:
+        # 保留原有译文，记录未通过质量检查的原因
+        update["$set"]["quality_issues"] = translation.quality_issues
+    return UpdateOne({"_id": translation.id, "lease_id": translation.lease_id}, update)
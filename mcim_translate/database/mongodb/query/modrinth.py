@@ -1,42 +1,30 @@
-from typing import List
-import time
+from typing import Any, List, Optional
+from pymongo.asynchronous.database import AsyncDatabase
 
 from mcim_translate.translate import Translation
+from mcim_translate.database.mongodb.query.lease import claim_translations
+from mcim_translate.database.mongodb.index import NEED_TO_UPDATE_INDEX
 from mcim_translate.constants import Platform
-from mcim_translate.database.mongodb import database
 from mcim_translate.config import Config
-from mcim_translate.logger import log
 
 config = Config.load()
 
 translate_config = config.translate
 
 
-def query_modrinth_database(batch_size: int) -> List[Translation]:
-    start_time = time.time()
-    results: List[Translation] = []
-
-    translated_modrinth_collection = database.get_collection("modrinth_translated")
-
-    for translated_mod in translated_modrinth_collection.find(
-        {"need_to_update": True}, {"_id": 1, "original": 1}
-    ).limit(batch_size):
-        results.append(
-            Translation(
-                platform=Platform.MODRINTH,
-                id=translated_mod["_id"],
-                original_text=translated_mod["original"],
-                translated_text=None,
-            )
-        )
-
-    log.debug(
-        f"Found {len(results)} records in {round(time.time() - start_time, 2)} seconds."
+async def query_modrinth_database(
+    database: AsyncDatabase, batch_size: int, after_id: Optional[Any] = None
+) -> tuple[List[Translation], Optional[Any]]:
+    """
+    分页领取待翻译记录，after_id 为上一页返回的分页位置
+    """
+    return await claim_translations(
+        database, "modrinth_translated", Platform.MODRINTH, batch_size, after_id
     )
 
-    return results
-
 
-def get_estimate_modrinth_translation_count() -> int:
+async def get_estimate_modrinth_translation_count(database: AsyncDatabase) -> int:
     translated_modrinth_collection = database.get_collection("modrinth_translated")
-    return translated_modrinth_collection.count_documents({"need_to_update": True})
\ No newline at end of file
+    return await translated_modrinth_collection.count_documents(
+        {"need_to_update": True}, hint=NEED_TO_UPDATE_INDEX
+    )
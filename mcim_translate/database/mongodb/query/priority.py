@@ -0,0 +1,138 @@
+from pymongo.asynchronous.database import AsyncDatabase
+from datetime import datetime
+from typing import Dict
+import time
+
+from mcim_translate.translate import translated_collection_name
+from mcim_translate.config import Config
+from mcim_translate.constants import Platform
+from mcim_translate.logger import log
+
+priority_config = Config.load().priority
+
+DAY_MILLISECONDS = 24 * 3600 * 1000
+
+# 各平台上次全量刷新 priority 的时间
+_refreshed_at: Dict[Platform, float] = {}
+
+
+def project_source(platform: Platform) -> tuple[str, str, str]:
+    """
+    返回 (项目数据集合, 下载量字段, 更新时间字段)
+    """
+    if platform == Platform.MODRINTH:
+        return (
+            priority_config.modrinth_collection,
+            priority_config.modrinth_downloads_field,
+            priority_config.modrinth_updated_field,
+        )
+    return (
+        priority_config.curseforge_collection,
+        priority_config.curseforge_downloads_field,
+        priority_config.curseforge_updated_field,
+    )
+
+
+def priority_expression(downloads_field: str, updated_field: str, now: datetime) -> dict:
+    """
+    priority = downloads_weight * log10(下载量 + 1) + recency_weight * 0.5 ^ (距上次更新天数 / half_life_days)
+
+    找不到项目数据或字段缺失时对应的部分为 0
+    """
+    downloads = {"$max": [{"$ifNull": [f"$project.{downloads_field}", 0]}, 0]}
+    updated = {
+        "$convert": {
+            "input": f"$project.{updated_field}",
+            "to": "date",
+            "onError": None,
+            "onNull": None,
+        }
+    }
+    recency = {
+        "$let": {
+            "vars": {"updated": updated},
+            "in": {
+                "$cond": [
+                    {"$eq": ["$$updated", None]},
+                    0,
+                    {
+                        "$pow": [
+                            0.5,
+                            {
+                                "$divide": [
+                                    {"$max": [{"$subtract": [now, "$$updated"]}, 0]},
+                                    priority_config.half_life_days * DAY_MILLISECONDS,
+                                ]
+                            },
+                        ]
+                    },
+                ]
+            },
+        }
+    }
+    return {
+        "$add": [
+            {
+                "$multiply": [
+                    priority_config.downloads_weight,
+                    {"$log10": {"$add": [downloads, 1]}},
+                ]
+            },
+            {"$multiply": [priority_config.recency_weight, recency]},
+        ]
+    }
+
+
+async def refresh_priorities(database: AsyncDatabase, platform: Platform):
+    """
+    按项目数据计算待翻译记录的 priority 字段
+
+    在数据库内通过 $lookup + $merge 完成，只处理 need_to_update 的记录；
+    每 refresh_interval 秒才全量重新计算一次，其余时候只计算还没有 priority 的记录
+    """
+    if not priority_config.enable:
+        return
+    start_time = time.time()
+    match = {"need_to_update": True}
+    full = (
+        platform not in _refreshed_at
+        or start_time - _refreshed_at[platform] >= priority_config.refresh_interval
+    )
+    if full:
+        _refreshed_at[platform] = start_time
+    else:
+        match["priority"] = None
+    collection_name = translated_collection_name(platform)
+    source, downloads_field, updated_field = project_source(platform)
+    await database.get_collection(collection_name).aggregate(
+        [
+            {"$match": match},
+            {
+                "$lookup": {
+                    "from": source,
+                    "localField": "_id",
+                    "foreignField": "_id",
+                    "as": "project",
+                }
+            },
+            {"$unwind": {"path": "$project", "preserveNullAndEmptyArrays": True}},
+            {
+                "$project": {
+                    "priority": priority_expression(
+                        downloads_field, updated_field, datetime.now()
+                    )
+                }
+            },
+            {
+                "$merge": {
+                    "into": collection_name,
+                    "on": "_id",
+                    "whenMatched": "merge",
+                    "whenNotMatched": "discard",
+                }
+            },
+        ]
+    )
+    log.debug(
+        f"Refreshed {'all' if full else 'missing'} {platform.value} translation priorities in {round(time.time() - start_time, 2)} seconds."
+    )
@@ -0,0 +1,153 @@
+from pymongo import UpdateOne
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import BulkWriteError
+from typing import Callable, Dict, List, Optional
+import asyncio
+import time
+
+from mcim_translate.translate import (
+    Translation,
+    build_translation_update,
+    translated_collection_name,
+)
+from mcim_translate.database.mongodb.query.lease import build_failure_update
+from mcim_translate.config import Config
+from mcim_translate.logger import log
+from mcim_translate.metrics import WRITE_OPERATIONS, WRITE_SECONDS
+
+translate_config = Config.load().translate
+
+FlushCallback = Callable[[List[Translation], List[Translation]], None]
+
+
+class BulkWriter:
+    """
+    译文写回缓冲
+
+    - 按集合缓存 UpdateOne，数量达到 batch_size 或距上次写入超过 flush_interval 秒时以 unordered bulk_write 写入
+    - 翻译失败的记录同样经由此处释放租约并记录失败次数
+    - 写入失败的译文放回缓存，随下次写入重试，最多 retries 次，避免租约过期后被重新领取、重复翻译
+    - 每次写入后通过 on_flush(成功列表, 失败列表) 逐条报告译文的写入结果，失败列表只包含重试用完的译文
+    - close() 会写入所有剩余缓存
+    """
+
+    def __init__(
+        self,
+        database: AsyncDatabase,
+        on_flush: Optional[FlushCallback] = None,
+        batch_size: int = translate_config.write_batch_size,
+        flush_interval: float = translate_config.write_flush_interval,
+        retries: int = translate_config.write_retries,
+    ):
+        self.database = database
+        self.on_flush = on_flush
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retries = max(0, retries)
+        # (平台, ID) -> 已重试次数
+        self._attempts: Dict[tuple, int] = {}
+        self._buffers: Dict[str, List[tuple[Translation, UpdateOne]]] = {}
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._closing = asyncio.Event()
+
+    def start(self):
+        if self._timer is None and self.flush_interval > 0:
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def _flush_periodically(self):
+        # 不直接 cancel 定时任务，避免取消进行中的写入导致已出队的译文丢失
+        while not self._closing.is_set():
+            try:
+                await asyncio.wait_for(self._closing.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    @property
+    def pending(self) -> int:
+        return sum(len(buffer) for buffer in self._buffers.values())
+
+    async def _add(self, translation: Translation, operation: UpdateOne):
+        name = translated_collection_name(translation.platform)
+        buffer = self._buffers.setdefault(name, [])
+        buffer.append((translation, operation))
+        if len(buffer) >= self.batch_size:
+            await self.flush(name)
+
+    async def add(self, translation: Translation):
+        await self._add(translation, build_translation_update(translation))
+
+    async def add_failure(self, translation: Translation):
+        await self._add(translation, build_failure_update(translation))
+
+    async def flush(self, name: Optional[str] = None):
+        async with self._lock:
+            names = [name] if name else list(self._buffers.keys())
+            for collection_name in names:
+                buffer = self._buffers.pop(collection_name, [])
+                if buffer:
+                    await self._write(collection_name, buffer)
+
+    async def _write(
+        self, collection_name: str, buffer: List[tuple[Translation, UpdateOne]]
+    ):
+        start_time = time.time()
+        operations = [operation for _, operation in buffer]
+        failed_indexes: Dict[int, str] = {}
+        try:
+            await self.database.get_collection(collection_name).bulk_write(
+                operations, ordered=False
+            )
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed_indexes[error["index"]] = error.get("errmsg", "")
+            if e.details.get("writeConcernErrors"):
+                log.error(f"Write concern errors on {collection_name}: {e.details['writeConcernErrors']}")
+        except Exception as e:
+            failed_indexes = {index: str(e) for index in range(len(buffer))}
+
+        written: List[Translation] = []
+        failed: List[Translation] = []
+        for index, (translation, operation) in enumerate(buffer):
+            if translation.translated_text is None:
+                # 失败记录写入失败时租约会自然过期，无需额外处理
+                continue
+            key = (translation.platform, translation.id)
+            if index not in failed_indexes:
+                self._attempts.pop(key, None)
+                written.append(translation)
+                continue
+            attempts = self._attempts.get(key, 0)
+            if attempts < self.retries:
+                log.warning(
+                    f"Failed to update translation {translation.platform.value} {translation.id}: {failed_indexes[index]}, "
+                    f"retrying on next flush ({attempts + 1}/{self.retries})."
+                )
+                self._attempts[key] = attempts + 1
+                # 已持有写入锁，直接放回缓存，由下次写入重试
+                self._buffers.setdefault(collection_name, []).append((translation, operation))
+                continue
+            self._attempts.pop(key, None)
+            log.error(
+                f"Failed to update translation {translation.platform.value} {translation.id}: {failed_indexes[index]}"
+            )
+            failed.append(translation)
+        WRITE_SECONDS.labels(collection_name).observe(time.time() - start_time)
+        WRITE_OPERATIONS.labels(collection_name, "ok").inc(len(buffer) - len(failed_indexes))
+        WRITE_OPERATIONS.labels(collection_name, "error").inc(len(failed_indexes))
+        log.debug(
+            f"Wrote {len(buffer)} operations to {collection_name} in {round(time.time() - start_time, 2)} seconds, {len(failed_indexes)} failed."
+        )
+        if self.on_flush is not None:
+            self.on_flush(written, failed)
+
+    async def close(self):
+        self._closing.set()
+        if self._timer is not None:
+            await self._timer
+            self._timer = None
+        await self.flush()
+        # 放回缓存的译文在重试次数用完前继续写入
+        while self.pending:
+            await asyncio.sleep(min(self.flush_interval, 1.0))
+            await self.flush()
@@ -0,0 +1,175 @@
+from pymongo.asynchronous.database import AsyncDatabase
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+import gzip
+import json
+import os
+import time
+
+from mcim_translate.translate import translated_collection_name
+from mcim_translate.database.mongodb import (
+    STATE_COLLECTION,
+    init_async_engine,
+    get_async_database,
+)
+from mcim_translate.config import Config
+from mcim_translate.constants import Platform
+from mcim_translate.logger import log
+
+export_config = Config.load().export
+
+EXPORT_FIELDS = {"_id": 1, "original": 1, "translated": 1, "translated_at": 1}
+
+
+def _row(doc: Dict[str, Any]) -> Dict[str, Any]:
+    translated_at = doc.get("translated_at")
+    return {
+        "id": doc["_id"],
+        "original": doc.get("original"),
+        "translated": doc.get("translated"),
+        "translated_at": translated_at.isoformat() if translated_at else None,
+    }
+
+
+class _JsonlWriter:
+    suffix = ".jsonl.gz"
+
+    def __init__(self, path: str):
+        self._fd = gzip.open(path, "wt", encoding="UTF-8")
+
+    def write(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            self._fd.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def close(self):
+        self._fd.close()
+
+
+class _ParquetWriter:
+    suffix = ".parquet"
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise RuntimeError("Parquet export requires pyarrow: pip install pyarrow") from e
+        self._pyarrow = pyarrow
+        # Modrinth 的 _id 是字符串，Curseforge 是整数，统一按字符串保存
+        self._schema = pyarrow.schema(
+            [
+                ("id", pyarrow.string()),
+                ("original", pyarrow.string()),
+                ("translated", pyarrow.string()),
+                ("translated_at", pyarrow.string()),
+            ]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write(self, rows: List[Dict[str, Any]]):
+        for row in rows:
+            row["id"] = str(row["id"])
+        # 每批写入一个 row group，内存占用只与 batch_size 有关
+        self._writer.write_table(self._pyarrow.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+WRITERS = {"jsonl": _JsonlWriter, "parquet": _ParquetWriter}
+
+
+def _watermark_id(collection_name: str) -> str:
+    return f"export_watermark:{collection_name}"
+
+
+async def export_collection(
+    database: AsyncDatabase,
+    platform: Platform,
+    output: str = export_config.path,
+    format: str = export_config.format,
+    incremental: bool = False,
+    batch_size: int = export_config.batch_size,
+) -> Optional[str]:
+    """
+    流式导出一个翻译集合，返回导出的文件路径，增量导出没有新记录时返回 None
+
+    - 全量导出所有已翻译的记录
+    - 增量导出上次水位之后、本次截止时间之前 translated_at 的记录
+    - 截止时间比当前时间早 lag 秒，避免漏掉尚未写回的批次；导出完成后才更新水位
+    """
+    start_time = time.time()
+    collection_name = translated_collection_name(platform)
+    collection = database.get_collection(collection_name)
+    state = database.get_collection(STATE_COLLECTION)
+    cutoff = datetime.now() - timedelta(seconds=export_config.lag)
+
+    query: Dict[str, Any] = {"translated": {"$ne": None}}
+    watermark: Optional[datetime] = None
+    if incremental:
+        state_doc = await state.find_one({"_id": _watermark_id(collection_name)})
+        watermark = state_doc["watermark"] if state_doc else None
+        query["translated_at"] = {"$lte": cutoff}
+        if watermark is not None:
+            query["translated_at"]["$gt"] = watermark
+
+    writer_class = WRITERS[format]
+    os.makedirs(output, exist_ok=True)
+    name = (
+        f"{collection_name}-diff-{watermark:%Y%m%d%H%M%S}-{cutoff:%Y%m%d%H%M%S}"
+        if incremental and watermark is not None
+        else f"{collection_name}-{cutoff:%Y%m%d%H%M%S}"
+    )
+    path = os.path.join(output, name + writer_class.suffix)
+    temp_path = path + ".tmp"
+
+    count = 0
+    writer = writer_class(temp_path)
+    try:
+        cursor = collection.find(query, EXPORT_FIELDS).batch_size(batch_size)
+        rows: List[Dict[str, Any]] = []
+        async for doc in cursor:
+            rows.append(_row(doc))
+            if len(rows) >= batch_size:
+                writer.write(rows)
+                count += len(rows)
+                rows = []
+        if rows:
+            writer.write(rows)
+            count += len(rows)
+    finally:
+        writer.close()
+
+    if incremental and count == 0:
+        os.remove(temp_path)
+        path = None
+    else:
+        os.replace(temp_path, path)
+    await state.update_one(
+        {"_id": _watermark_id(collection_name)},
+        {"$set": {"watermark": cutoff, "updated_at": datetime.now()}},
+        upsert=True,
+    )
+    log.info(
+        f"Exported {count} {platform.value} translations to {path} in {round(time.time() - start_time, 2)} seconds."
+    )
+    return path
+
+
+async def run_export(
+    platforms: List[Platform],
+    output: str = export_config.path,
+    format: str = export_config.format,
+    incremental: bool = False,
+) -> List[str]:
+    async_engine = init_async_engine()
+    try:
+        database = get_async_database(async_engine)
+        paths = []
+        for platform in platforms:
+            path = await export_collection(database, platform, output, format, incremental)
+            if path:
+                paths.append(path)
+        return paths
+    finally:
+        await async_engine.close()
@@ -0,0 +1,72 @@
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from mcim_translate.config import Config
+from mcim_translate.logger import log
+
+metrics_config = Config.load().metrics
+
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)
+
+QUERY_SECONDS = Histogram(
+    "translate_query_seconds",
+    "领取一页待翻译记录的耗时",
+    ["platform"],
+    buckets=LATENCY_BUCKETS,
+)
+QUEUE_WAIT_SECONDS = Histogram(
+    "translate_queue_wait_seconds",
+    "记录入队到被 worker 取出的等待时间",
+    ["platform"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_SECONDS = Histogram(
+    "translate_llm_seconds",
+    "单次 LLM 请求的耗时，不含限流排队",
+    ["provider", "model", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "translate_llm_tokens",
+    "LLM 请求消耗的 token，direction 为 prompt 或 completion",
+    ["provider", "model", "direction"],
+)
+POSTPROCESS_SECONDS = Histogram(
+    "translate_postprocess_seconds",
+    "译文后处理与质量检查的耗时",
+    ["stage"],
+    buckets=FAST_BUCKETS,
+)
+WRITE_SECONDS = Histogram(
+    "translate_write_seconds",
+    "一次 bulk_write 写回的耗时",
+    ["collection"],
+    buckets=LATENCY_BUCKETS,
+)
+WRITE_OPERATIONS = Counter(
+    "translate_write_operations",
+    "写回的操作数，result 为 ok 或 error",
+    ["collection", "result"],
+)
+ITEMS = Counter(
+    "translate_items",
+    "处理的记录数，result 为 success、failed、skipped 或 quality_failed",
+    ["platform", "result"],
+)
+BACKLOG = Gauge(
+    "translate_backlog",
+    "剩余待翻译记录数的估计值",
+    ["platform"],
+)
+
+
+def start_metrics_server(
+    host: str = metrics_config.host, port: int = metrics_config.port
+):
+    """
+    在后台线程中提供 /metrics
+    """
+    if not metrics_config.enable:
+        return
+    start_http_server(port, addr=host)
+    log.info(f"Prometheus metrics available at http://{host}:{port}/metrics.")
@@ -0,0 +1,554 @@
+from openai import AsyncOpenAI
+from pymongo import UpdateOne
+from pymongo.asynchronous.database import AsyncDatabase
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+
+from mcim_translate.translate import (
+    Translation,
+    build_translation_update,
+    completion_kwargs,
+    post_processing_text,
+    system_prompt,
+    translated_collection_name,
+)
+from mcim_translate.translate.glossary import find_terms, get_glossary
+from mcim_translate.translate.quality import check_translation
+from mcim_translate.translate.record import build_http_client
+from mcim_translate.database.mongodb import (
+    BATCH_COLLECTION,
+    init_async_engine,
+    get_async_database,
+)
+from mcim_translate.config import Config
+from mcim_translate.constants import Platform
+from mcim_translate.logger import log
+
+config = Config.load()
+translate_config = config.translate
+migrate_config = config.migrate
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# 批处理任务在本地的状态：prepared 已生成输入文件 -> submitted 已提交 -> ingested 已写回 / failed 失败
+PREPARED = "prepared"
+SUBMITTED = "submitted"
+INGESTED = "ingested"
+FAILED = "failed"
+
+# 非 shadow 模式下新译文未通过质量检查时，在文档上记录 {model, issues, run}，同一模型不再重译
+MIGRATION_QUALITY_FIELD = "migration_quality_issues"
+
+# 远端仍在处理中的状态
+PENDING_REMOTE_STATUSES = {"validating", "in_progress", "finalizing", "cancelling"}
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _run_directory(run: str) -> str:
+    return os.path.join(migrate_config.path, re.sub(r"[^\w.-]", "_", run))
+
+
+def build_batch_request(translation: Translation, model: str) -> Dict[str, Any]:
+    """
+    与同步翻译相同的提示词和参数，custom_id 带上原文摘要，写回时用于识别期间被修改的原文
+    """
+    body: Dict[str, Any] = {
+        "model": model,
+        "messages": [
+            {
+                "role": "system",
+                "content": system_prompt(
+                    translate_config.target_language, find_terms([translation.original_text])
+                ),
+            },
+            {"role": "user", "content": translation.original_text},
+        ],
+        "temperature": translate_config.temperature,
+    }
+    kwargs = completion_kwargs()
+    if kwargs["reasoning_effort"] is not None:
+        body["reasoning_effort"] = kwargs["reasoning_effort"]
+    body.update(kwargs["extra_body"] or {})
+    return {
+        "custom_id": json.dumps([translation.id, _text_hash(translation.original_text)]),
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": body,
+    }
+
+
+def migration_query(model: str, shadow: bool, after_id: Optional[Any] = None) -> dict:
+    """
+    译文不是由 model 翻译的记录，跳过未经过 LLM 的记录和 model 的译文未通过质量检查的记录
+    """
+    query: Dict[str, Any] = {
+        "translated": {"$ne": None},
+        "skip_reason": {"$exists": False},
+        "translated_model": {"$ne": model},
+        f"{MIGRATION_QUALITY_FIELD}.model": {"$ne": model},
+    }
+    if shadow:
+        query[f"{migrate_config.shadow_field}.model"] = {"$ne": model}
+    if after_id is not None:
+        query["_id"] = {"$gt": after_id}
+    return query
+
+
+class BatchMigration:
+    """
+    通过 OpenAI 兼容的 /batches 接口批量重译整个语料
+
+    - 按 _id 顺序把需要重译的记录写成 JSONL 输入文件，每 requests_per_batch 条或 max_batch_bytes 字节一个批处理任务
+    - 最多同时提交 max_active_batches 个任务，每 poll_interval 秒查询一次，完成后流式读取结果并批量写回
+    - 写回前与同步翻译一样做后处理和质量检查；只在原文未变化时写入，期间修改过的记录留给常规翻译
+    - 未通过质量检查的新译文不覆盖当前译文，在 migration_quality_issues 中记录，之后的运行不再重译
+    - shadow 模式下新译文写入 shadow_field，不影响当前译文，确认后用 cutover() 替换
+    - 失败、过期或有出错请求的任务按原 _id 区间重新排队，最多 max_batch_retries 次
+    - 进度保存在 translate_batches 集合中，中断后以相同的 run 重新运行即可继续
+    """
+
+    def __init__(
+        self,
+        database: AsyncDatabase,
+        client: AsyncOpenAI,
+        run: str,
+        model: str,
+        shadow: bool = migrate_config.shadow,
+    ):
+        self.database = database
+        self.client = client
+        self.run = run
+        self.model = model
+        self.shadow = shadow
+        self.batches = database.get_collection(BATCH_COLLECTION)
+        self.ingested_count = 0
+        self.stale_count = 0
+        self.failed_count = 0
+        self.quality_failed_count = 0
+        self.used_tokens = 0
+
+    async def _next_seq(self, platform: Platform) -> int:
+        last = await self.batches.find_one(
+            {"run": self.run, "platform": platform.value}, sort=[("seq", -1)]
+        )
+        return last["seq"] + 1 if last else 0
+
+    async def prepare(self, platform: Platform) -> int:
+        """
+        从上次生成的最后一个 _id 之后继续生成输入文件，返回新生成的任务数
+        """
+        # 重新排队的任务覆盖的是之前的区间，不参与确定断点
+        last = await self.batches.find_one(
+            {"run": self.run, "platform": platform.value, "requeue_of": {"$exists": False}},
+            sort=[("seq", -1)],
+        )
+        query = migration_query(self.model, self.shadow, last["last_id"] if last else None)
+        prepared = await self._write_batches(platform, query)
+        log.info(f"Prepared {prepared} {platform.value} batches for run {self.run}.")
+        return prepared
+
+    async def _write_batches(
+        self, platform: Platform, query: dict, attempt: int = 0, requeue_of: Optional[str] = None
+    ) -> int:
+        seq = await self._next_seq(platform)
+        directory = _run_directory(self.run)
+        os.makedirs(directory, exist_ok=True)
+
+        collection = self.database.get_collection(translated_collection_name(platform))
+        cursor = collection.find(query, {"original": 1}).sort("_id", 1)
+
+        prepared = 0
+        fd = None
+        path = ""
+        first_id = None
+        last_id = None
+        count = 0
+        size = 0
+        async for doc in cursor:
+            if not doc.get("original"):
+                continue
+            if fd is None:
+                path = os.path.join(directory, f"{platform.value.lower()}-{seq:05d}.jsonl")
+                fd = open(path + ".tmp", "w", encoding="UTF-8")
+                first_id = doc["_id"]
+                count = 0
+                size = 0
+            translation = Translation(
+                platform=platform, id=doc["_id"], original_text=doc["original"]
+            )
+            line = json.dumps(build_batch_request(translation, self.model), ensure_ascii=False) + "\n"
+            fd.write(line)
+            count += 1
+            size += len(line.encode("utf-8"))
+            last_id = doc["_id"]
+            if count >= migrate_config.requests_per_batch or size >= migrate_config.max_batch_bytes:
+                fd.close()
+                fd = None
+                await self._save_prepared(
+                    platform, seq, path, first_id, last_id, count, attempt, requeue_of
+                )
+                seq += 1
+                prepared += 1
+        if fd is not None:
+            fd.close()
+            await self._save_prepared(
+                platform, seq, path, first_id, last_id, count, attempt, requeue_of
+            )
+            prepared += 1
+        return prepared
+
+    async def _requeue(self) -> int:
+        """
+        失败或只有部分结果的任务，按原区间重新生成输入文件，已经翻译完成或未通过质量检查的记录会被查询条件排除
+
+        每个区间最多重试 max_batch_retries 次，返回新生成的任务数
+        """
+        prepared = 0
+        async for batch in self.batches.find({"run": self.run, "needs_retry": True}):
+            platform = Platform(batch["platform"])
+            attempt = batch.get("attempt", 0) + 1
+            if attempt > migrate_config.max_batch_retries:
+                log.error(
+                    f"Batch {batch['_id']} still incomplete after {migrate_config.max_batch_retries} retries, giving up."
+                )
+            else:
+                query = migration_query(self.model, batch["shadow"])
+                query["_id"] = {"$gte": batch["first_id"], "$lte": batch["last_id"]}
+                count = await self._write_batches(platform, query, attempt, batch["_id"])
+                prepared += count
+                log.info(f"Requeued batch {batch['_id']} as {count} new batches (attempt {attempt}).")
+            await self.batches.update_one(
+                {"_id": batch["_id"]}, {"$set": {"needs_retry": False}}
+            )
+        return prepared
+
+    async def _save_prepared(
+        self,
+        platform: Platform,
+        seq: int,
+        path: str,
+        first_id: Any,
+        last_id: Any,
+        count: int,
+        attempt: int = 0,
+        requeue_of: Optional[str] = None,
+    ):
+        # 先落盘再记录进度，中断时未记录的文件下次会被覆盖
+        os.replace(path + ".tmp", path)
+        batch = {
+            "_id": f"{self.run}:{platform.value}:{seq:05d}",
+            "run": self.run,
+            "platform": platform.value,
+            "seq": seq,
+            "model": self.model,
+            "shadow": self.shadow,
+            "path": path,
+            "first_id": first_id,
+            "last_id": last_id,
+            "count": count,
+            "attempt": attempt,
+            "status": PREPARED,
+            "created_at": datetime.now(),
+        }
+        if requeue_of is not None:
+            batch["requeue_of"] = requeue_of
+        await self.batches.insert_one(batch)
+
+    async def _submit(self, batch: dict):
+        file = await self.client.files.create(file=Path(batch["path"]), purpose="batch")
+        remote = await self.client.batches.create(
+            input_file_id=file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=migrate_config.completion_window,
+            metadata={"run": self.run, "batch": batch["_id"]},
+        )
+        await self.batches.update_one(
+            {"_id": batch["_id"]},
+            {
+                "$set": {
+                    "status": SUBMITTED,
+                    "input_file_id": file.id,
+                    "batch_id": remote.id,
+                    "submitted_at": datetime.now(),
+                }
+            },
+        )
+        log.info(f"Submitted batch {batch['_id']} ({batch['count']} requests) as {remote.id}.")
+
+    async def _poll(self, batch: dict):
+        remote = await self.client.batches.retrieve(batch["batch_id"])
+        if remote.status in PENDING_REMOTE_STATUSES:
+            return
+        update: Dict[str, Any] = {
+            "remote_status": remote.status,
+            "finished_at": datetime.now(),
+        }
+        if remote.output_file_id:
+            update.update(await self._ingest(batch, remote.output_file_id))
+            update["status"] = INGESTED
+        else:
+            update["status"] = FAILED
+            log.error(f"Batch {batch['_id']} ({remote.id}) ended as {remote.status} without output.")
+        if remote.error_file_id:
+            errors = await self._count_errors(remote.error_file_id)
+            update["failed"] = update.get("failed", 0) + errors
+            self.failed_count += errors
+        # 失败、过期或有出错请求的任务由 _requeue 重新排队，质量不合格的记录不重试
+        update["needs_retry"] = (
+            remote.status != "completed" or update.get("failed", 0) > 0
+        )
+        await self.batches.update_one({"_id": batch["_id"]}, {"$set": update})
+
+    async def _ingest(self, batch: dict, output_file_id: str) -> Dict[str, int]:
+        """
+        流式读取结果文件，每 write_batch_size 条写回一次，重复写入同一结果不会产生副作用
+        """
+        start_time = time.time()
+        platform = Platform(batch["platform"])
+        counts = {"ingested": 0, "stale": 0, "failed": 0, "quality_failed": 0, "used_tokens": 0}
+        results: List[dict] = []
+        async with self.client.files.with_streaming_response.content(output_file_id) as response:
+            async for line in response.iter_lines():
+                if not line.strip():
+                    continue
+                results.append(json.loads(line))
+                if len(results) >= translate_config.write_batch_size:
+                    await self._write_results(batch, platform, results, counts)
+                    results = []
+        if results:
+            await self._write_results(batch, platform, results, counts)
+        self.ingested_count += counts["ingested"]
+        self.stale_count += counts["stale"]
+        self.failed_count += counts["failed"]
+        self.quality_failed_count += counts["quality_failed"]
+        self.used_tokens += counts["used_tokens"]
+        log.info(
+            f"Ingested batch {batch['_id']} in {round(time.time() - start_time, 2)} seconds: "
+            f"{counts['ingested']} written, {counts['stale']} stale, {counts['failed']} failed, "
+            f"{counts['quality_failed']} failed quality check, {counts['used_tokens']} tokens."
+        )
+        return counts
+
+    async def _count_errors(self, error_file_id: str) -> int:
+        count = 0
+        async with self.client.files.with_streaming_response.content(error_file_id) as response:
+            async for line in response.iter_lines():
+                if line.strip():
+                    count += 1
+        return count
+
+    async def _write_results(
+        self, batch: dict, platform: Platform, results: List[dict], counts: Dict[str, int]
+    ):
+        parsed: Dict[Any, tuple[str, str, int]] = {}
+        for result in results:
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                counts["failed"] += 1
+                continue
+            project_id, text_hash = json.loads(result["custom_id"])
+            body = response["body"]
+            usage = body.get("usage") or {}
+            parsed[project_id] = (
+                text_hash,
+                body["choices"][0]["message"]["content"] or "",
+                usage.get("total_tokens", 0),
+            )
+        if not parsed:
+            return
+
+        collection = self.database.get_collection(translated_collection_name(platform))
+        originals = {
+            doc["_id"]: doc.get("original")
+            async for doc in collection.find({"_id": {"$in": list(parsed)}}, {"original": 1})
+        }
+        operations: List[UpdateOne] = []
+        for project_id, (text_hash, content, used_tokens) in parsed.items():
+            counts["used_tokens"] += used_tokens
+            original = originals.get(project_id)
+            if not original or _text_hash(original) != text_hash:
+                counts["stale"] += 1
+                continue
+            translation = Translation(
+                platform=platform,
+                id=project_id,
+                original_text=original,
+                translated_text=post_processing_text(content),
+                model=batch["model"],
+                used_tokens=used_tokens,
+            )
+            issues = (
+                check_translation(original, translation.translated_text)
+                if translate_config.quality.enable
+                else []
+            )
+            if issues:
+                counts["quality_failed"] += 1
+            if batch["shadow"]:
+                shadow = {
+                    "translated": translation.translated_text,
+                    "original": original,
+                    "model": translation.model,
+                    "run": self.run,
+                    "used_tokens": used_tokens,
+                    "translated_at": datetime.now(),
+                }
+                if issues:
+                    shadow["quality_issues"] = issues
+                operations.append(
+                    UpdateOne(
+                        {"_id": project_id, "original": original},
+                        {"$set": {migrate_config.shadow_field: shadow}},
+                    )
+                )
+            elif issues:
+                # 不合格的新译文不覆盖当前译文，记录结果避免重复提交
+                operations.append(
+                    UpdateOne(
+                        {"_id": project_id, "original": original},
+                        {
+                            "$set": {
+                                MIGRATION_QUALITY_FIELD: {
+                                    "model": translation.model,
+                                    "issues": issues,
+                                    "run": self.run,
+                                }
+                            }
+                        },
+                    )
+                )
+            else:
+                operations.append(build_translation_update(translation))
+        if operations:
+            result = await collection.bulk_write(operations, ordered=False)
+            counts["ingested"] += result.matched_count
+            counts["stale"] += len(operations) - result.matched_count
+
+    async def migrate(self, platforms: List[Platform]):
+        for platform in platforms:
+            await self.prepare(platform)
+        while True:
+            submitted = await self.batches.find(
+                {"run": self.run, "status": SUBMITTED}
+            ).to_list()
+            free = migrate_config.max_active_batches - len(submitted)
+            if free > 0:
+                prepared = await self.batches.find(
+                    {"run": self.run, "status": PREPARED}, sort=[("platform", 1), ("seq", 1)]
+                ).to_list(free)
+                for batch in prepared:
+                    await self._submit(batch)
+                submitted = await self.batches.find(
+                    {"run": self.run, "status": SUBMITTED}
+                ).to_list()
+            for batch in submitted:
+                await self._poll(batch)
+            await self._requeue()
+            remaining = await self.batches.count_documents(
+                {"run": self.run, "status": {"$in": [PREPARED, SUBMITTED]}}
+            )
+            if not remaining:
+                break
+            log.info(f"{remaining} batches of run {self.run} remaining.")
+            await asyncio.sleep(migrate_config.poll_interval)
+        log.info(
+            f"Migration run {self.run} finished: {self.ingested_count} written, {self.stale_count} stale, "
+            f"{self.failed_count} failed, {self.quality_failed_count} failed quality check, used {self.used_tokens} tokens."
+        )
+
+
+async def cutover(database: AsyncDatabase, platform: Platform, model: str) -> int:
+    """
+    用通过质量检查的 shadow 译文替换当前译文，返回替换的记录数
+
+    shadow 生成后原文被修改的记录不替换，shadow 同样被删除；有质量问题的 shadow 保留供检查
+    """
+    field = migrate_config.shadow_field
+    collection = database.get_collection(translated_collection_name(platform))
+    cursor = collection.find(
+        {f"{field}.model": model, f"{field}.quality_issues": {"$exists": False}},
+        {field: 1},
+    ).batch_size(translate_config.write_batch_size)
+    promoted = 0
+    operations: List[UpdateOne] = []
+    ids: List[Any] = []
+
+    async def flush():
+        nonlocal promoted
+        result = await collection.bulk_write(operations, ordered=False)
+        promoted += result.matched_count
+        await collection.update_many({"_id": {"$in": ids}}, {"$unset": {field: ""}})
+        operations.clear()
+        ids.clear()
+
+    async for doc in cursor:
+        shadow = doc[field]
+        translation = Translation(
+            platform=platform,
+            id=doc["_id"],
+            original_text=shadow["original"],
+            translated_text=shadow["translated"],
+            model=shadow["model"],
+            used_tokens=shadow.get("used_tokens", 0),
+        )
+        operations.append(build_translation_update(translation))
+        ids.append(doc["_id"])
+        if len(operations) >= translate_config.write_batch_size:
+            await flush()
+    if operations:
+        await flush()
+    rejected = await collection.count_documents({f"{field}.model": model})
+    log.info(
+        f"Cut over {promoted} {platform.value} translations to {model}, "
+        f"{rejected} shadow translations with quality issues kept for review."
+    )
+    return promoted
+
+
+def build_batch_client() -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key=migrate_config.api_key or translate_config.api_key,
+        base_url=migrate_config.base_url or translate_config.base_url,
+        http_client=build_http_client(),
+    )
+
+
+async def run_migration(
+    platforms: List[Platform],
+    model: Optional[str] = None,
+    run: Optional[str] = None,
+    shadow: bool = migrate_config.shadow,
+):
+    """
+    run 默认为模型名，以相同的 run 重新运行会从中断处继续
+    """
+    model = model or migrate_config.model or translate_config.model
+    get_glossary()
+    async_engine = init_async_engine()
+    client = build_batch_client()
+    try:
+        database = get_async_database(async_engine)
+        await BatchMigration(database, client, run or model, model, shadow).migrate(platforms)
+    finally:
+        await client.close()
+        await async_engine.close()
+
+
+async def run_cutover(platforms: List[Platform], model: Optional[str] = None) -> int:
+    model = model or migrate_config.model or translate_config.model
+    async_engine = init_async_engine()
+    try:
+        database = get_async_database(async_engine)
+        return sum([await cutover(database, platform, model) for platform in platforms])
+    finally:
+        await async_engine.close()
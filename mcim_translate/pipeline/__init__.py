@@ -0,0 +1,600 @@
+from pydantic import BaseModel
+from pymongo.asynchronous.database import AsyncDatabase
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Union,
+)
+from contextlib import asynccontextmanager
+import asyncio
+import math
+import time
+
+from mcim_translate.translate import (
+    Translation,
+    Provider,
+    build_providers,
+    estimate_text_tokens,
+    translate_text,
+)
+from mcim_translate.translate.batch import process_batch_translations
+from mcim_translate.translate.memory import MemoryStats, TranslationMemory
+from mcim_translate.translate.incremental import process_incremental_translation
+from mcim_translate.translate.glossary import get_glossary, find_terms, missing_terms
+from mcim_translate.translate.skip import classify_text
+from mcim_translate.translate.quality import check_translation
+from mcim_translate.database.mongodb import init_async_engine, get_async_database
+from mcim_translate.database.mongodb.writer import BulkWriter
+from mcim_translate.database.mongodb.journal import TranslationJournal
+from mcim_translate.database.mongodb.index import ensure_indexes
+from mcim_translate.pipeline.budget import TokenBudget
+from mcim_translate.database.mongodb.query.priority import refresh_priorities
+from mcim_translate.database.mongodb.query import (
+    query_curseforge_database,
+    query_modrinth_database,
+    get_estimate_curseforge_translation_count,
+    get_estimate_modrinth_translation_count,
+)
+from mcim_translate.config import Config
+from mcim_translate.constants import Mode, Platform
+from mcim_translate.metrics import (
+    BACKLOG,
+    ITEMS,
+    POSTPROCESS_SECONDS,
+    QUERY_SECONDS,
+    QUEUE_WAIT_SECONDS,
+)
+from mcim_translate.logger import log
+
+if TYPE_CHECKING:
+    from mcim_translate.pipeline.scheduler import FairShareScheduler
+
+config = Config.load()
+translate_config = config.translate
+watch_config = config.watch
+journal_config = config.journal
+quality_config = translate_config.quality
+
+QUERY_FUNCS: Dict[
+    Platform, Callable[..., Awaitable[tuple[List[Translation], Optional[Any]]]]
+] = {
+    Platform.CURSEFORGE: query_curseforge_database,
+    Platform.MODRINTH: query_modrinth_database,
+}
+
+ESTIMATE_COUNT_FUNCS: Dict[Platform, Callable[[AsyncDatabase], Awaitable[int]]] = {
+    Platform.CURSEFORGE: get_estimate_curseforge_translation_count,
+    Platform.MODRINTH: get_estimate_modrinth_translation_count,
+}
+
+
+IdleCallback = Callable[[Platform, List[Union[int, str]]], Awaitable[None]]
+
+
+class PipelineResult(BaseModel):
+    platform: Platform
+    success_count: int = 0
+    failed_count: int = 0
+    total_used_token: int = 0
+    translated_ids: List[Union[int, str]] = []
+    memory_lru_hits: int = 0
+    memory_db_hits: int = 0
+    memory_misses: int = 0
+    incremental_count: int = 0
+    glossary_misses: int = 0
+    skipped_count: int = 0
+    quality_failed_count: int = 0
+    estimated_tokens: int = 0
+    budget_exhausted: bool = False
+
+    @property
+    def memory_hit_rate(self) -> float:
+        lookups = self.memory_lru_hits + self.memory_db_hits + self.memory_misses
+        return round((self.memory_lru_hits + self.memory_db_hits) / lookups, 4) if lookups else 0.0
+
+    @property
+    def tokens_per_item(self) -> float:
+        return round(self.total_used_token / self.success_count, 1) if self.success_count else 0.0
+
+
+class BacklogCounter:
+    """
+    剩余待翻译数量
+
+    每 refresh_interval 秒才真正统计一次，期间按写回成功的数量递减
+    """
+
+    def __init__(
+        self,
+        database: AsyncDatabase,
+        platform: Platform,
+        refresh_interval: float = translate_config.count_refresh_interval,
+    ):
+        self.database = database
+        self.platform = platform
+        self.refresh_interval = refresh_interval
+        self._count = 0
+        self._refreshed_at: Optional[float] = None
+
+    async def get(self) -> int:
+        if (
+            self._refreshed_at is None
+            or time.time() - self._refreshed_at > self.refresh_interval
+        ):
+            self._count = await ESTIMATE_COUNT_FUNCS[self.platform](self.database)
+            self._refreshed_at = time.time()
+            BACKLOG.labels(self.platform.value).set(max(0, self._count))
+        return max(0, self._count)
+
+    def decrement(self, count: int):
+        self._count -= count
+        BACKLOG.labels(self.platform.value).set(max(0, self._count))
+
+
+class TranslationPipeline:
+    """
+    读取 -> 翻译 -> 写回 三段式流水线
+
+    - 读取：按优先级分页持续读取待翻译记录，填入有界队列
+    - 翻译：concurrency 个 worker 从队列取任务，保证同时进行的请求数维持在上限
+    - 写回：单独的协程写回数据库，不阻塞翻译
+
+    传入 wake 事件时为持续模式：读完所有待翻译记录后不退出，等待 wake 被触发或超过 rescan_interval 秒后重新扫描
+
+    传入 scheduler 时不启动自己的 worker，记录放入 scheduler 的共享队列，由所有平台共享的 worker 翻译
+    """
+
+    def __init__(
+        self,
+        platform: Platform,
+        database: AsyncDatabase,
+        providers: Dict[Mode, Provider],
+        concurrency: int = translate_config.concurrency,
+        queue_size: int = translate_config.queue_size,
+        chunk_size: int = translate_config.chunk_size,
+        prompt_batch_size: int = translate_config.prompt_batch_size,
+        max_batch_tokens: int = translate_config.max_batch_tokens,
+        memory: Optional[TranslationMemory] = None,
+        budget: Optional[TokenBudget] = None,
+        journal: Optional[TranslationJournal] = None,
+        wake: Optional[asyncio.Event] = None,
+        on_idle: Optional[IdleCallback] = None,
+        scheduler: Optional["FairShareScheduler"] = None,
+    ):
+        self.platform = platform
+        self.database = database
+        self.providers = providers
+        self.concurrency = max(1, concurrency)
+        self.chunk_size = max(1, chunk_size)
+        self.prompt_batch_size = max(1, prompt_batch_size)
+        self.max_batch_tokens = max_batch_tokens
+        self.memory = memory
+        # 翻译记忆在 PipelineContext 内共享，只统计本次运行的命中情况
+        self.memory_stats = MemoryStats()
+        self.budget = budget or TokenBudget(database)
+        self.journal = journal
+        self.wake = wake
+        self.on_idle = on_idle
+        self._reported = 0
+        self.writer = BulkWriter(database, on_flush=self._on_flush)
+        self.backlog = BacklogCounter(database, platform)
+        # (-估算 token, 入队序号, 入队时间, 记录)
+        self.job_queue: asyncio.PriorityQueue[
+            tuple[float, int, float, Optional[Translation]]
+        ] = asyncio.PriorityQueue(maxsize=max(queue_size, self.concurrency))
+        self._sequence = 0
+        self.result_queue: asyncio.Queue[Optional[Translation]] = asyncio.Queue(
+            maxsize=max(queue_size, self.concurrency)
+        )
+        self.result = PipelineResult(platform=platform)
+        self.scheduler = scheduler
+        self.lane = scheduler.register(self) if scheduler is not None else None
+
+    async def _skip(self, translation: Translation) -> bool:
+        """
+        无需翻译的文本原样写回，不经过 LLM
+        """
+        if not translate_config.skip_filter:
+            return False
+        reason = classify_text(translation.original_text)
+        if reason is None:
+            return False
+        translation.translated_text = translation.original_text
+        translation.skip_reason = reason.value
+        self.result.skipped_count += 1
+        ITEMS.labels(self.platform.value, "skipped").inc()
+        log.debug(
+            f"Skipped {translation.platform.value} {translation.id}: {reason.value}."
+        )
+        await self.result_queue.put(translation)
+        return True
+
+    async def _enqueue(self, translation: Translation):
+        if await self._skip(translation):
+            return
+        translation.estimated_tokens = estimate_text_tokens(translation.original_text)
+        self.budget.reserve(translation.estimated_tokens)
+        if self.lane is not None:
+            await self.lane.put(translation)
+            return
+        self._sequence += 1
+        # 估算 token 多的长文本优先翻译，避免拖在最后
+        await self.job_queue.put(
+            (-translation.estimated_tokens, self._sequence, time.time(), translation)
+        )
+
+    async def _budget_available(self) -> bool:
+        """
+        预算用完时：持续模式下等到次日预算重置，否则停止领取新任务
+        """
+        await self.budget.persist()
+        while self.budget.exhausted:
+            if self.wake is not None and not self.budget.run_exhausted:
+                await self.budget.wait_for_next_day()
+                continue
+            log.warning(
+                f"Token budget exhausted after {self.budget.used} tokens, stopping {self.platform.value} translation."
+            )
+            self.result.budget_exhausted = True
+            return False
+        return True
+
+    async def _produce(self):
+        query_func = QUERY_FUNCS[self.platform]
+        while await self._budget_available():
+            # 每轮扫描前为新的待翻译记录计算优先级（全量刷新有单独的间隔），之后按优先级翻页领取，同一轮内不会重复读取失败的记录
+            await refresh_priorities(self.database, self.platform)
+            last_id = None
+            while await self._budget_available():
+                with QUERY_SECONDS.labels(self.platform.value).time():
+                    translate_jobs, last_id = await query_func(
+                        self.database, batch_size=self.chunk_size, after_id=last_id
+                    )
+                if last_id is None:
+                    break
+                for translation in translate_jobs:
+                    await self._enqueue(translation)
+
+                estimate_count = await self.backlog.get()
+                log.info(
+                    f"Successfully translated {self.result.success_count} items, {estimate_count} items remaining."
+                )
+
+            if self.wake is None or self.result.budget_exhausted:
+                break
+            await self._idle()
+            await self._wait_for_work()
+
+        if self.lane is not None:
+            await self.lane.close()
+            return
+        for _ in range(self.concurrency):
+            self._sequence += 1
+            await self.job_queue.put((math.inf, self._sequence, 0.0, None))
+
+    async def _idle(self):
+        """
+        持续模式下一轮扫描结束，报告自上次以来写回的记录
+        """
+        if self.on_idle is None:
+            return
+        await self.writer.flush()
+        translated_ids = self.result.translated_ids[self._reported :]
+        self._reported = len(self.result.translated_ids)
+        if translated_ids:
+            await self.on_idle(self.platform, translated_ids)
+
+    async def _wait_for_work(self):
+        """
+        等待 wake 事件，之后在 debounce 秒内没有新事件（最多等待 debounce_max 秒）才返回
+
+        写回失败、退避到期和租约过期的记录不会产生变更事件，rescan_interval 秒内没有事件时也返回
+        """
+        try:
+            await asyncio.wait_for(self.wake.wait(), watch_config.rescan_interval)
+        except asyncio.TimeoutError:
+            return
+        deadline = time.time() + watch_config.debounce_max
+        while True:
+            self.wake.clear()
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(
+                    self.wake.wait(), min(watch_config.debounce, remaining)
+                )
+            except asyncio.TimeoutError:
+                break
+
+    async def _translate_incremental(
+        self, translations: List[Translation]
+    ) -> tuple[List[Translation], List[Translation]]:
+        """
+        有上次句子对的记录先尝试增量翻译，返回 (成功, 需要整段翻译)
+        """
+        incremental_jobs = [t for t in translations if t.previous_segments]
+        if not incremental_jobs:
+            return [], translations
+        results = await asyncio.gather(
+            *(
+                process_incremental_translation(t, Mode.UPGRADE, self.providers)
+                for t in incremental_jobs
+            )
+        )
+        success_jobs: List[Translation] = []
+        for result, tokens in results:
+            self.result.total_used_token += tokens
+            if result:
+                success_jobs.append(result)
+        self.result.incremental_count += len(success_jobs)
+        return success_jobs, [t for t in translations if t.translated_text is None]
+
+    async def _translate(
+        self, translations: List[Translation]
+    ) -> tuple[List[Translation], List[Translation]]:
+        used_tokens = self.result.total_used_token
+        incremental_jobs, pending_jobs = await self._translate_incremental(translations)
+        success_jobs, failed_jobs, tokens = await process_batch_translations(
+            pending_jobs, Mode.UPGRADE, self.providers, self.memory, self.memory_stats
+        )
+        self.result.total_used_token += tokens
+        success_jobs, quality_failed_jobs = await self._check_quality(
+            incremental_jobs + success_jobs
+        )
+        failed_jobs += quality_failed_jobs
+        self.result.failed_count += len(failed_jobs)
+        ITEMS.labels(self.platform.value, "failed").inc(len(failed_jobs))
+        if self.memory is not None:
+            for result in success_jobs:
+                # 来自翻译记忆的译文无需再次写入
+                if not result.from_memory and result.model is not None:
+                    await self.memory.put(
+                        result.original_text, result.translated_text, result.model
+                    )
+
+        estimated_tokens = sum(t.estimated_tokens for t in translations)
+        self.result.estimated_tokens += estimated_tokens
+        self.budget.commit(estimated_tokens, self.result.total_used_token - used_tokens)
+        return success_jobs, failed_jobs
+
+    async def _next_batch(self) -> tuple[List[Translation], bool]:
+        """
+        取一个任务后，把队列中已就绪的任务打包，不等待新任务
+
+        打包的条数不超过 prompt_batch_size，估算 token 不超过 max_batch_tokens
+        """
+        translations: List[Translation] = []
+        batch_tokens = 0
+        item = await self.job_queue.get()
+        while item[3] is not None:
+            translation = item[3]
+            if translations and batch_tokens + translation.estimated_tokens > self.max_batch_tokens:
+                # 放回队列留给下一个请求，取出后队列必有空位
+                self.job_queue.put_nowait(item)
+                return translations, False
+            QUEUE_WAIT_SECONDS.labels(self.platform.value).observe(time.time() - item[2])
+            translations.append(translation)
+            batch_tokens += translation.estimated_tokens
+            if len(translations) >= self.prompt_batch_size or self.job_queue.empty():
+                return translations, False
+            item = self.job_queue.get_nowait()
+        return translations, True
+
+    async def _retry_translation(self, translation: Translation) -> List[str]:
+        """
+        使用更严格的提示词重新翻译不合格的译文，有备用模型时优先使用，返回仍存在的问题
+        """
+        issues = check_translation(translation.original_text, translation.translated_text)
+        mode = Mode.DOWNGRADE if Mode.DOWNGRADE in self.providers else Mode.UPGRADE
+        for _ in range(quality_config.retries):
+            if not issues:
+                break
+            log.debug(
+                f"Translation {translation.platform.value} {translation.id} failed quality check {issues}, retrying."
+            )
+            text, tokens, provider = await translate_text(
+                translation.original_text, self.providers, mode=mode, strict=True
+            )
+            self.result.total_used_token += tokens
+            if not text:
+                continue
+            retry_issues = check_translation(translation.original_text, text)
+            if len(retry_issues) < len(issues):
+                translation.translated_text = text
+                translation.mode = provider.mode
+                translation.model = provider.model
+                translation.used_tokens += tokens
+                translation.segments = None
+            issues = retry_issues
+        return issues
+
+    async def _check_quality(
+        self, translations: List[Translation]
+    ) -> tuple[List[Translation], List[Translation]]:
+        """
+        写回前检查新译文的质量，返回 (通过, 未通过)
+
+        重试后仍不合格的记录按失败处理并在文档上记录问题，之后按退避重新翻译
+        """
+        if not quality_config.enable:
+            return translations, []
+        checked = [t for t in translations if not t.from_memory]
+        with POSTPROCESS_SECONDS.labels("quality").time():
+            results = await asyncio.gather(*(self._retry_translation(t) for t in checked))
+        failed_jobs: List[Translation] = []
+        for translation, issues in zip(checked, results):
+            if issues:
+                log.warning(
+                    f"Translation {translation.platform.value} {translation.id} failed quality check: {issues}."
+                )
+                translation.translated_text = None
+                translation.quality_issues = issues
+                failed_jobs.append(translation)
+        self.result.quality_failed_count += len(failed_jobs)
+        ITEMS.labels(self.platform.value, "quality_failed").inc(len(failed_jobs))
+        return [t for t in translations if t.translated_text is not None], failed_jobs
+
+    def _check_glossary(self, translation: Translation):
+        terms = find_terms([translation.original_text])
+        missing = missing_terms(translation.translated_text, terms)
+        if missing:
+            self.result.glossary_misses += 1
+            log.debug(
+                f"Glossary terms {missing} not used in {translation.platform.value} {translation.id}."
+            )
+
+    async def process_batch(self, translations: List[Translation]):
+        """
+        翻译一批记录并交给写回阶段
+        """
+        success_jobs, failed_jobs = await self._translate(translations)
+        for result in success_jobs:
+            self._check_glossary(result)
+            if self.journal is not None:
+                # 先落盘再写回，写回前崩溃时下次启动重放
+                await self.journal.append(result)
+            await self.result_queue.put(result)
+        # 失败的记录同样交给写回阶段释放租约
+        for translation in failed_jobs:
+            await self.result_queue.put(translation)
+
+    async def _translate_worker(self):
+        finished = False
+        while not finished:
+            translations, finished = await self._next_batch()
+            if translations:
+                await self.process_batch(translations)
+
+    async def _translate_workers(self):
+        if self.lane is not None:
+            await self.lane.drained()
+        else:
+            await asyncio.gather(
+                *(self._translate_worker() for _ in range(self.concurrency))
+            )
+        await self.result_queue.put(None)
+
+    def _on_flush(self, written: List[Translation], failed: List[Translation]):
+        if self.journal is not None:
+            self.journal.confirm(written)
+        self.result.success_count += len(written)
+        self.result.translated_ids.extend(t.id for t in written)
+        self.result.failed_count += len(failed)
+        ITEMS.labels(self.platform.value, "success").inc(len(written))
+        ITEMS.labels(self.platform.value, "failed").inc(len(failed))
+        self.backlog.decrement(len(written))
+
+    async def _write_back(self):
+        while True:
+            translation = await self.result_queue.get()
+            if translation is None:
+                break
+            if translation.translated_text is None:
+                await self.writer.add_failure(translation)
+            else:
+                await self.writer.add(translation)
+
+    async def run(self) -> PipelineResult:
+        start_time = time.time()
+        self.writer.start()
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self._produce())
+                tg.create_task(self._translate_workers())
+                tg.create_task(self._write_back())
+        finally:
+            if self.lane is not None:
+                # 从共享队列注销，异常退出时丢弃剩余的记录，租约过期后会被重新领取
+                self.lane.release()
+            # 退出前写入所有缓存的译文
+            await self.writer.close()
+            if self.memory is not None:
+                await self.memory.flush()
+            await self.budget.persist()
+        self.result.memory_lru_hits = self.memory_stats.lru_hits
+        self.result.memory_db_hits = self.memory_stats.db_hits
+        self.result.memory_misses = self.memory_stats.misses
+        log.info(
+            f"{self.platform.value} pipeline finished in {round(time.time() - start_time, 2)} seconds, "
+            f"{self.result.tokens_per_item} tokens per item with prompt_batch_size={self.prompt_batch_size}, "
+            f"{self.result.incremental_count} incrementally re-translated, "
+            f"{self.result.skipped_count} skipped without translation, "
+            f"{self.result.quality_failed_count} failed quality check, "
+            f"{self.result.glossary_misses} with unused glossary terms, "
+            f"estimated {self.result.estimated_tokens} tokens, used {self.result.total_used_token} tokens."
+        )
+        for provider in self.providers.values():
+            limiter = provider.limiter
+            log.info(
+                f"{provider.name}: concurrency limit {limiter.concurrency}, "
+                f"{limiter.rate_limited_count} rate limited, latency {round(limiter.latency_ewma or 0, 2)} seconds."
+            )
+        return self.result
+
+
+class PipelineContext:
+    """
+    一个事件循环内共享的数据库连接、翻译后端和翻译记忆
+    """
+
+    def __init__(
+        self,
+        database: AsyncDatabase,
+        providers: Dict[Mode, Provider],
+        memory: Optional[TranslationMemory],
+        journal: Optional[TranslationJournal] = None,
+    ):
+        self.database = database
+        self.providers = providers
+        self.memory = memory
+        self.journal = journal
+        self.budget = TokenBudget(database)
+
+    def pipeline(self, platform: Platform, **kwargs) -> TranslationPipeline:
+        kwargs.setdefault("budget", self.budget)
+        return TranslationPipeline(
+            platform,
+            self.database,
+            self.providers,
+            memory=self.memory,
+            journal=self.journal,
+            **kwargs,
+        )
+
+
+@asynccontextmanager
+async def open_pipeline_context() -> AsyncIterator[PipelineContext]:
+    # 术语表只在首次调用时构建
+    get_glossary()
+    async_engine = init_async_engine()
+    providers = build_providers()
+    journal = TranslationJournal() if journal_config.enable else None
+    try:
+        database = get_async_database(async_engine)
+        await ensure_indexes(database)
+        if journal is not None:
+            await journal.replay(database)
+        yield PipelineContext(
+            database,
+            providers,
+            TranslationMemory(database) if translate_config.enable_memory else None,
+            journal,
+        )
+    finally:
+        if journal is not None:
+            await journal.close()
+        for provider in providers.values():
+            await provider.close()
+        await async_engine.close()
+
+
+async def run_pipeline(platform: Platform) -> PipelineResult:
+    async with open_pipeline_context() as context:
+        return await context.pipeline(platform).run()
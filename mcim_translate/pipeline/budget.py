@@ -0,0 +1,103 @@
+from pymongo import ReturnDocument
+from pymongo.asynchronous.database import AsyncDatabase
+from datetime import date, datetime, timedelta
+from typing import Optional
+import asyncio
+
+from mcim_translate.database.mongodb import STATE_COLLECTION
+from mcim_translate.config import Config
+from mcim_translate.logger import log
+
+translate_config = Config.load().translate
+
+
+class TokenBudget:
+    """
+    单次运行和每日的 token 预算
+
+    - 任务入队时按估算值预占，翻译完成后按实际用量结算
+    - 每日用量保存在 translate_state 集合中，多个 worker 共享
+    - 同一个实例可以由多个平台的流水线共用，单次运行预算由它们共同累计，reset_run() 开始新一轮运行
+    """
+
+    def __init__(
+        self,
+        database: AsyncDatabase,
+        run_limit: Optional[int] = translate_config.run_token_budget,
+        daily_limit: Optional[int] = translate_config.daily_token_budget,
+    ):
+        self.collection = database.get_collection(STATE_COLLECTION)
+        self.run_limit = run_limit
+        self.daily_limit = daily_limit
+        self.used = 0
+        self.reserved = 0
+        self.estimated = 0
+        self._day = date.today()
+        self._daily_used = 0
+        self._unpersisted = 0
+
+    @property
+    def _state_id(self) -> str:
+        return f"token_usage:{self._day.isoformat()}"
+
+    async def persist(self):
+        """
+        写入本地累计的用量并读回所有 worker 的当日总用量
+        """
+        if self.daily_limit is None:
+            return
+        if date.today() != self._day:
+            # 跨天时未写入的用量记到前一天
+            await self._increase(self._unpersisted)
+            self._day = date.today()
+            self._unpersisted = 0
+        await self._increase(self._unpersisted)
+        self._unpersisted = 0
+
+    async def _increase(self, tokens: int):
+        state = await self.collection.find_one_and_update(
+            {"_id": self._state_id},
+            {"$inc": {"tokens": tokens}, "$set": {"updated_at": datetime.now()}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self._daily_used = state["tokens"]
+
+    def reset_run(self):
+        """
+        清零单次运行的用量，每日用量不受影响
+        """
+        self.used = 0
+        self.reserved = 0
+        self.estimated = 0
+
+    def reserve(self, estimated_tokens: int):
+        self.reserved += estimated_tokens
+
+    def commit(self, estimated_tokens: int, used_tokens: int):
+        self.reserved = max(0, self.reserved - estimated_tokens)
+        self.estimated += estimated_tokens
+        self.used += used_tokens
+        self._unpersisted += used_tokens
+
+    @property
+    def run_exhausted(self) -> bool:
+        return self.run_limit is not None and self.used + self.reserved >= self.run_limit
+
+    @property
+    def daily_exhausted(self) -> bool:
+        return (
+            self.daily_limit is not None
+            and self._daily_used + self._unpersisted + self.reserved >= self.daily_limit
+        )
+
+    @property
+    def exhausted(self) -> bool:
+        return self.run_exhausted or self.daily_exhausted
+
+    async def wait_for_next_day(self):
+        tomorrow = datetime.combine(date.today() + timedelta(days=1), datetime.min.time())
+        seconds = (tomorrow - datetime.now()).total_seconds()
+        log.info(f"Daily token budget exhausted, waiting {round(seconds)} seconds for reset.")
+        await asyncio.sleep(seconds)
+        await self.persist()
@@ -0,0 +1,315 @@
+from apscheduler.triggers.cron import CronTrigger
+from typing import Callable, Dict, List, Optional, Sequence, Set
+from datetime import datetime
+import asyncio
+import heapq
+import os
+import sys
+import time
+
+from mcim_translate.pipeline import (
+    PipelineContext,
+    PipelineResult,
+    TranslationPipeline,
+    open_pipeline_context,
+)
+from mcim_translate.translate import Translation
+from mcim_translate.config import Config, PlatformSchedule
+from mcim_translate.constants import Platform
+from mcim_translate.metrics import QUEUE_WAIT_SECONDS
+from mcim_translate.logger import log
+
+config = Config.load()
+scheduler_config = config.scheduler
+
+# 内存超限时重新检查的间隔秒数
+MEMORY_POLL_INTERVAL = 1.0
+
+ResultCallback = Callable[[PipelineResult], None]
+
+
+def platform_schedule(platform: Platform) -> PlatformSchedule:
+    return getattr(scheduler_config, platform.value.lower())
+
+
+def platform_cron(platform: Platform) -> str:
+    return platform_schedule(platform).cron or getattr(
+        config, f"{platform.value.lower()}_cron"
+    )
+
+
+def current_rss() -> Optional[int]:
+    """
+    当前进程的常驻内存字节数，不支持 /proc 的系统返回 None
+    """
+    try:
+        with open("/proc/self/statm") as fd:
+            return int(fd.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class Lane:
+    """
+    共享队列中一个平台的待翻译记录
+    """
+
+    def __init__(
+        self,
+        scheduler: "FairShareScheduler",
+        pipeline: TranslationPipeline,
+        schedule: PlatformSchedule,
+    ):
+        self.scheduler = scheduler
+        self.pipeline = pipeline
+        self.platform = pipeline.platform
+        self.weight = max(0.01, schedule.weight)
+        self.queue_size = max(1, schedule.queue_size)
+        # (-估算 token, 入队序号, 入队时间, 记录)，与流水线自己的队列顺序一致
+        self.heap: List[tuple[float, int, float, Translation]] = []
+        # 已分配的估算 token 除以权重，越小越先分配
+        self.pass_value = 0.0
+        self.in_flight = 0
+        self.closed = False
+        self.error: Optional[BaseException] = None
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def put(self, translation: Translation):
+        await self.scheduler._put(self, translation)
+
+    async def close(self):
+        """
+        不再放入新记录
+        """
+        await self.scheduler._close_lane(self)
+
+    async def drained(self):
+        """
+        等待关闭后所有记录翻译完成，翻译出错时抛出异常
+        """
+        await self.scheduler._wait_drained(self)
+
+    def release(self):
+        self.scheduler._release(self)
+
+
+class FairShareScheduler:
+    """
+    所有平台共享的翻译队列与 worker
+
+    - 各平台的流水线把记录放入各自的 Lane，由 concurrency 个共享 worker 翻译，总并发不随平台数增加
+    - 加权公平分配：每次取估算 token 已分配量除以权重最小的平台，两个平台都有积压时按权重分配吞吐，互不饿死
+    - 平台从空闲恢复时不累计空闲期间的份额，避免突发占满所有 worker
+    - 每个平台最多排队 queue_size 条；所有平台排队的原文超过 max_queue_bytes，或进程常驻内存超过 max_rss_mb 时，暂停放入新记录
+    - 同时进行的各平台运行共用一个 TokenBudget，run_token_budget 是所有平台合计的上限；
+      所有平台的运行都结束后，下一次运行开始新一轮预算。每日预算由所有运行共同累计在 translate_state 中
+    """
+
+    def __init__(
+        self,
+        concurrency: int = scheduler_config.concurrency or config.translate.concurrency,
+        max_queue_bytes: int = scheduler_config.max_queue_bytes,
+        max_rss_mb: Optional[int] = scheduler_config.max_rss_mb,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_queue_bytes = max_queue_bytes
+        self.max_rss = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.lanes: Dict[Platform, Lane] = {}
+        self.queued_bytes = 0
+        self.virtual_time = 0.0
+        self._sequence = 0
+        self._closed = False
+        self._condition = asyncio.Condition()
+        # 正在进行的平台运行数，为 0 时下一次运行开始新一轮预算
+        self._active_runs = 0
+
+    def register(self, pipeline: TranslationPipeline) -> Lane:
+        if pipeline.platform in self.lanes:
+            raise RuntimeError(f"{pipeline.platform.value} is already scheduled.")
+        lane = Lane(self, pipeline, platform_schedule(pipeline.platform))
+        lane.pass_value = self.virtual_time
+        self.lanes[pipeline.platform] = lane
+        return lane
+
+    def _memory_available(self) -> bool:
+        if self.queued_bytes == 0:
+            # 队列为空时总是允许放入，保证仍能继续翻译
+            return True
+        if self.queued_bytes >= self.max_queue_bytes:
+            return False
+        if self.max_rss is not None:
+            rss = current_rss()
+            if rss is not None and rss >= self.max_rss:
+                return False
+        return True
+
+    async def _put(self, lane: Lane, translation: Translation):
+        async with self._condition:
+            while len(lane.heap) >= lane.queue_size or not self._memory_available():
+                try:
+                    # 内存占用不会通知，定期重新检查
+                    await asyncio.wait_for(self._condition.wait(), MEMORY_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            if not lane.heap and not lane.in_flight:
+                lane.pass_value = max(lane.pass_value, self.virtual_time)
+            self._sequence += 1
+            heapq.heappush(
+                lane.heap,
+                (-translation.estimated_tokens, self._sequence, time.time(), translation),
+            )
+            self.queued_bytes += sys.getsizeof(translation.original_text)
+            self._condition.notify_all()
+
+    def _pop(self, lane: Lane) -> Translation:
+        _, _, enqueued_at, translation = heapq.heappop(lane.heap)
+        self.queued_bytes -= sys.getsizeof(translation.original_text)
+        QUEUE_WAIT_SECONDS.labels(lane.platform.value).observe(time.time() - enqueued_at)
+        return translation
+
+    def _take_batch(self, lane: Lane) -> List[Translation]:
+        """
+        与流水线自己的 worker 相同：打包已就绪的记录，不超过 prompt_batch_size 条和 max_batch_tokens
+        """
+        pipeline = lane.pipeline
+        translations = [self._pop(lane)]
+        batch_tokens = translations[0].estimated_tokens
+        while lane.heap and len(translations) < pipeline.prompt_batch_size:
+            estimated_tokens = lane.heap[0][3].estimated_tokens
+            if batch_tokens + estimated_tokens > pipeline.max_batch_tokens:
+                break
+            translations.append(self._pop(lane))
+            batch_tokens += estimated_tokens
+        return translations
+
+    async def _next(self) -> Optional[tuple[Lane, List[Translation]]]:
+        async with self._condition:
+            while True:
+                ready = [lane for lane in self.lanes.values() if lane.heap]
+                if ready:
+                    break
+                if self._closed:
+                    return None
+                await self._condition.wait()
+            lane = min(ready, key=lambda lane: lane.pass_value)
+            translations = self._take_batch(lane)
+            self.virtual_time = max(self.virtual_time, lane.pass_value)
+            lane.pass_value += max(1, sum(t.estimated_tokens for t in translations)) / lane.weight
+            lane.in_flight += 1
+            # 腾出了排队名额
+            self._condition.notify_all()
+            return lane, translations
+
+    async def _worker(self):
+        while True:
+            item = await self._next()
+            if item is None:
+                return
+            lane, translations = item
+            # 单独的任务便于流水线退出时取消，不影响共享 worker
+            task = asyncio.create_task(lane.pipeline.process_batch(translations))
+            lane.tasks.add(task)
+            try:
+                await asyncio.wait([task])
+            finally:
+                lane.tasks.discard(task)
+                lane.in_flight -= 1
+                if not task.done():
+                    task.cancel()
+            if not task.cancelled() and task.exception() is not None:
+                lane.error = task.exception()
+            async with self._condition:
+                self._condition.notify_all()
+
+    async def _close_lane(self, lane: Lane):
+        async with self._condition:
+            lane.closed = True
+            self._condition.notify_all()
+
+    async def _wait_drained(self, lane: Lane):
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: lane.error is not None
+                or (lane.closed and not lane.heap and not lane.in_flight)
+            )
+        if lane.error is not None:
+            raise lane.error
+
+    def _release(self, lane: Lane):
+        if self.lanes.get(lane.platform) is lane:
+            del self.lanes[lane.platform]
+        for _, _, _, translation in lane.heap:
+            self.queued_bytes -= sys.getsizeof(translation.original_text)
+        lane.heap.clear()
+        for task in lane.tasks:
+            task.cancel()
+
+    async def run(self):
+        await asyncio.gather(*(self._worker() for _ in range(self.concurrency)))
+
+    async def close(self):
+        """
+        队列中的记录翻译完后 worker 退出
+        """
+        async with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    async def run_platform(
+        self,
+        context: PipelineContext,
+        platform: Platform,
+        on_result: Optional[ResultCallback] = None,
+        once: bool = False,
+    ):
+        """
+        按平台自己的 cron 定期扫描待翻译记录，首次立即运行；运行超过下次触发时间时只补跑一次
+
+        所有平台的运行共用 context.budget
+        """
+        trigger = CronTrigger.from_crontab(platform_cron(platform))
+        while True:
+            log.info(f"Starting {platform.value} translation check...")
+            started_at = datetime.now(trigger.timezone)
+            if self._active_runs == 0:
+                context.budget.reset_run()
+            self._active_runs += 1
+            try:
+                result = await context.pipeline(platform, scheduler=self).run()
+            except Exception as e:
+                log.exception(f"{platform.value} translation failed: {e}")
+            else:
+                if on_result is not None:
+                    on_result(result)
+            finally:
+                self._active_runs -= 1
+            if once:
+                return
+            # 从本次运行开始的时间计算，运行期间错过的触发时间已过时立即补跑，多次错过也只补跑一次
+            next_time = trigger.get_next_fire_time(None, started_at)
+            log.info(f"Next {platform.value} translation check at {next_time}.")
+            await asyncio.sleep(
+                max(0.0, (next_time - datetime.now(trigger.timezone)).total_seconds())
+            )
+
+
+async def run_scheduled(
+    platforms: Sequence[Platform] = tuple(Platform),
+    on_result: Optional[ResultCallback] = None,
+    once: bool = False,
+):
+    """
+    所有平台共用一个 FairShareScheduler；once 为 True 时每个平台翻译完当前待翻译记录后退出
+    """
+    async with open_pipeline_context() as context:
+        scheduler = FairShareScheduler()
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(scheduler.run())
+            try:
+                async with asyncio.TaskGroup() as runs:
+                    for platform in platforms:
+                        runs.create_task(
+                            scheduler.run_platform(context, platform, on_result, once)
+                        )
+            finally:
+                await scheduler.close()
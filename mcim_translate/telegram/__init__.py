@@ -1,7 +1,9 @@
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from telegram.helpers import escape_markdown
+import queue
+import threading
+import time
 import httpx
-import tenacity
 
 from mcim_translate.config import Config
 from mcim_translate.logger import log
@@ -11,81 +13,205 @@ telegram_config = Config.load().telegram
 
 TELEGRAM_MAX_CHARS = 4096  # Telegram 文本消息最大长度
 
-def _make_spoiler_block_with_budget(lines: List[str], budget: int, prefix: str = "> ") -> str:
+# 分页标记预留的长度，足够容纳 "（第 9999/9999 页）"
+PAGE_LABEL_RESERVE = len("（第 9999/9999 页）")
+
+HEADERS = {
+    Platform.CURSEFORGE: ("已翻译 {count} 个 Curseforge 模组{page}，以下为模组 ID:\n", "\n#Curseforge_Translate"),
+    Platform.MODRINTH: ("已翻译 {count} 个 Modrinth 项目{page}，以下为项目 ID:\n", "\n#Modrinth_Translate"),
+}
+
+
+def _paginate_lines(lines: List[str], budget: int, prefix: str = "> ") -> List[List[str]]:
     """
-    将 lines 按行拼接到 spoiler 中，确保拼接后的内容长度不超过 budget。
-    注意：budget 应该已扣除 spoiler 包裹符号 '||' 的长度。
+    将 lines 逐行转义后按 budget 分页，每页拼接后的长度不超过 budget
+    注意：budget 应该已扣除 spoiler 包裹符号 '**' 与 '||' 的长度。
     """
-    assembled_lines: List[str] = []
+    pages: List[List[str]] = []
+    current: List[str] = []
     used = 0
     for line in lines:
-        # 逐行转义并加入前缀
         escaped_line = f"{prefix}{escape_markdown(line, version=2)}"
         # 如果不是第一行，需要额外的换行符
-        increment = len(escaped_line) + (1 if assembled_lines else 0)
-        if used + increment > budget:
-            break
-        assembled_lines.append(escaped_line)
+        increment = len(escaped_line) + (1 if current else 0)
+        if current and used + increment > budget:
+            pages.append(current)
+            current = []
+            increment = len(escaped_line)
+            used = 0
+        current.append(escaped_line)
         used += increment
-    return f"**{'\n'.join(assembled_lines)}||"
-
-
-@tenacity.retry(
-    # retry=tenacity.retry_if_exception_type(TelegramError, NetworkError), # 无条件重试
-    wait=tenacity.wait_fixed(1),
-    stop=tenacity.stop_after_attempt(10),
-)
-def send_message_sync(
-    text: str,
-    chat_id: str,
-    parse_mode: Optional[str] = None,
-) -> int:
-    data = {
-        "chat_id": chat_id,
-        "text": text,
-        # TODO: 支持 Markdown
-    }
-    if parse_mode:
-        data["parse_mode"] = parse_mode
-    result = httpx.post(
-        f"{telegram_config.bot_api}{telegram_config.bot_token}/sendMessage",
-        json=data,
-    ).json()
-    if result["ok"]:
-        log.info(
-            f"Message '{text}' sent to telegram, message_id: {result['result']['message_id']}"
-        )
-        return result["result"]["message_id"]
-    else:
-        raise Exception(
-            f"Telegram API error: {result}, original message: {repr(text)}, parse_mode: {parse_mode}"
-        )
+    if current:
+        pages.append(current)
+    return pages
 
 
-def send_result(platform: Platform, project_ids: List[Union[int, str]]) -> int:
-    if platform == Platform.CURSEFORGE:
-        header_raw = f"已翻译 {len(project_ids)} 个 Curseforge 模组，以下为模组 ID:\n"
-        footer_raw = "\n#Curseforge_Translate"
-    elif platform == Platform.MODRINTH:
-        header_raw = f"已翻译 {len(project_ids)} 个 Modrinth 项目，以下为项目 ID:\n"
-        footer_raw = "\n#Modrinth_Translate"
-    else:
+def build_messages(platform: Platform, project_ids: List[Union[int, str]]) -> List[str]:
+    """
+    生成翻译结果消息，ID 放不下一条消息时拆成多条
+    """
+    if platform not in HEADERS:
         raise ValueError(f"Unknown platform: {platform}")
+    header_template, footer_raw = HEADERS[platform]
 
     # 先转义头尾
-    header = escape_markdown(header_raw, version=2)
     footer = escape_markdown(footer_raw, version=2)
+    longest_header = escape_markdown(
+        header_template.format(count=len(project_ids), page=""), version=2
+    )
 
     # 预留 spoiler 包裹符号 '**' + '||' 的 4 个字符
-    budget_for_lines = TELEGRAM_MAX_CHARS - len(header) - len(footer) - 4
+    budget_for_lines = (
+        TELEGRAM_MAX_CHARS - len(longest_header) - PAGE_LABEL_RESERVE - len(footer) - 4
+    )
+    pages = _paginate_lines([str(pid) for pid in project_ids], budget_for_lines, prefix="> ")
+
+    messages = []
+    for index, lines in enumerate(pages, start=1):
+        page = f"（第 {index}/{len(pages)} 页）" if len(pages) > 1 else ""
+        header = escape_markdown(
+            header_template.format(count=len(project_ids), page=page), version=2
+        )
+        messages.append(f"{header}**{'\n'.join(lines)}||{footer}")
+    return messages
+
+
+class TelegramNotifier:
+    """
+    后台发送翻译结果通知，不阻塞翻译任务
 
-    id_lines = [str(pid) for pid in project_ids]
-    spoiler_block = _make_spoiler_block_with_budget(id_lines, budget_for_lines, prefix="> ")
+    - notify() 只把结果放入队列后立即返回，消息由后台线程发送
+    - 收到结果后等待 coalesce_interval 秒，合并这段时间内各平台、各轮次的结果，按平台去重后一起发送
+    - ID 过多时拆成多条消息，不再截断
+    - 所有请求复用同一个 httpx.Client；两条消息之间至少间隔 min_interval 秒，遇到 429 按 retry_after 暂停
+    - 单条消息最多尝试 max_retries 次，仍失败时记录日志后放弃
+    """
+
+    def __init__(
+        self,
+        coalesce_interval: float = telegram_config.coalesce_interval,
+        min_interval: float = telegram_config.min_interval,
+        max_retries: int = telegram_config.max_retries,
+        timeout: float = telegram_config.timeout,
+    ):
+        self.coalesce_interval = coalesce_interval
+        self.min_interval = min_interval
+        self.max_retries = max(1, max_retries)
+        self.timeout = timeout
+        self._queue: "queue.Queue[Optional[tuple[Platform, List[Union[int, str]]]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.Client] = None
+        self._last_sent = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._client = httpx.Client(timeout=self.timeout)
+                self._thread = threading.Thread(
+                    target=self._run, name="telegram-notifier", daemon=True
+                )
+                self._thread.start()
+
+    def notify(self, platform: Platform, project_ids: List[Union[int, str]]):
+        if not telegram_config.enable or not project_ids:
+            return
+        self.start()
+        self._queue.put((platform, list(project_ids)))
+
+    def close(self, timeout: float = telegram_config.flush_timeout):
+        """
+        立即发送已合并的结果，最多等待 timeout 秒
+        """
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        if thread.is_alive():
+            log.warning(f"Telegram notifier did not finish within {timeout} seconds, remaining messages dropped.")
+
+    def _run(self):
+        client = self._client
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            pending: Dict[Platform, Dict[Union[int, str], None]] = {}
+            deadline = time.monotonic() + self.coalesce_interval
+            while item is not None:
+                platform, project_ids = item
+                pending.setdefault(platform, {}).update(dict.fromkeys(project_ids))
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+            for platform, project_ids in pending.items():
+                try:
+                    messages = build_messages(platform, list(project_ids))
+                except Exception as e:
+                    log.error(f"Failed to build telegram message for {platform.value}: {e}")
+                    continue
+                for message in messages:
+                    self._send(client, message)
+        client.close()
 
-    message = f"{header}{spoiler_block}{footer}"
+    def _send(
+        self, client: httpx.Client, text: str, parse_mode: str = "MarkdownV2"
+    ) -> Optional[int]:
+        data = {
+            "chat_id": telegram_config.chat_id,
+            "text": text,
+            "parse_mode": parse_mode,
+        }
+        for attempt in range(1, self.max_retries + 1):
+            wait_time = self._last_sent + self.min_interval - time.monotonic()
+            if wait_time > 0:
+                time.sleep(wait_time)
+            self._last_sent = time.monotonic()
+            try:
+                response = client.post(
+                    f"{telegram_config.bot_api}{telegram_config.bot_token}/sendMessage",
+                    json=data,
+                )
+                result = response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                log.warning(f"Telegram request failed (attempt {attempt}/{self.max_retries}): {e}")
+                time.sleep(min(2**attempt, 60))
+                continue
 
-    return send_message_sync(
-        message,
-        telegram_config.chat_id,
-        parse_mode="MarkdownV2"
-    )
\ No newline at end of file
+            if result.get("ok"):
+                message_id = result["result"]["message_id"]
+                log.info(f"Message sent to telegram, {len(text)} chars, message_id: {message_id}")
+                return message_id
+            if response.status_code == 429:
+                retry_after = result.get("parameters", {}).get("retry_after", 1)
+                log.warning(f"Telegram rate limited, retrying after {retry_after} seconds.")
+                time.sleep(retry_after)
+                continue
+            if 400 <= response.status_code < 500:
+                # 消息本身有误，重试无意义
+                log.error(f"Telegram API error: {result}, original message: {repr(text)}, parse_mode: {parse_mode}")
+                return None
+            log.warning(f"Telegram API error (attempt {attempt}/{self.max_retries}): {result}")
+            time.sleep(min(2**attempt, 60))
+        log.error(f"Giving up telegram message after {self.max_retries} attempts: {repr(text)}")
+        return None
+
+
+notifier = TelegramNotifier()
+
+
+def send_result(platform: Platform, project_ids: List[Union[int, str]]):
+    """
+    提交翻译结果通知，不等待发送完成；未启用 telegram 时忽略
+    """
+    notifier.notify(platform, project_ids)
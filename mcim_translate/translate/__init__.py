@@ -1,27 +1,30 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, RateLimitError
 from pydantic import BaseModel
-from typing import List, Union, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from pymongo import UpdateOne
+from pymongo.asynchronous.database import AsyncDatabase
+from typing import Dict, List, Union, Optional
 from datetime import datetime
 import time
 
 from mcim_translate.logger import log
 from mcim_translate.config import Config
 from mcim_translate.constants import Platform, Mode
-from mcim_translate.database.mongodb import database
+from mcim_translate.translate.segment import Segment, align_segments
+from mcim_translate.translate.glossary import find_terms, glossary_prompt
+from mcim_translate.translate.ratelimit import AdaptiveLimiter, parse_retry_after
+from mcim_translate.translate.router import ProviderHealth, routed_request
+from mcim_translate.translate.guard import OutputGuard, RunawayOutputError
+from mcim_translate.translate.record import build_http_client
+from mcim_translate.metrics import LLM_SECONDS, LLM_TOKENS, POSTPROCESS_SECONDS
+from mcim_translate.translate.tokens import (
+    estimate_messages_tokens,
+    estimate_tokens,
+    estimate_translation_tokens,
+)
 import re
 
 translate_config = Config.load().translate
 
-CLIENT = OpenAI(api_key=translate_config.api_key, base_url=translate_config.base_url)
-if translate_config.enable_backup:
-    BACKUP_CLIENT = OpenAI(
-        api_key=translate_config.backup_api_key,
-        base_url=translate_config.backup_base_url,
-    )
-else:
-    BACKUP_CLIENT = None
-
 CHUNK_SIZE = translate_config.chunk_size
 
 
@@ -31,6 +34,245 @@ class Translation(BaseModel):
     original_text: str
     translated_text: Optional[str] = None
     mode: Mode = Mode.UPGRADE
+    model: Optional[str] = None
+    used_tokens: int = 0
+    estimated_tokens: int = 0
+    # 上一次翻译保存的句子对，用于增量翻译
+    previous_segments: Optional[List[Segment]] = None
+    # 本次翻译的句子对，为空时写回前按句子对齐
+    segments: Optional[List[Segment]] = None
+    # 领取记录时写入的租约，写回时释放
+    lease_id: Optional[str] = None
+    failed_count: int = 0
+    # 未经过 LLM 直接写回的原因，见 SkipReason
+    skip_reason: Optional[str] = None
+    # 未通过质量检查的问题，见 check_translation
+    quality_issues: Optional[List[str]] = None
+    # 译文来自翻译记忆，不再检查质量或写回翻译记忆
+    from_memory: bool = False
+
+
+class Provider:
+    """
+    一个 OpenAI 兼容的翻译后端
+
+    AsyncOpenAI 内部的连接池绑定在事件循环上，需要在运行流水线的事件循环中创建
+    """
+
+    def __init__(
+        self,
+        mode: Mode,
+        client: AsyncOpenAI,
+        model: str,
+        completion_kwargs: Optional[dict] = None,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+    ):
+        self.mode = mode
+        self.client = client
+        self.model = model
+        self.completion_kwargs = completion_kwargs or {}
+        self.name = f"{mode.value}:{model}"
+        self.limiter = AdaptiveLimiter(
+            self.name, translate_config.concurrency, rpm=rpm, tpm=tpm
+        )
+        self.health = ProviderHealth()
+
+    def observe(
+        self,
+        start_time: float,
+        status: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+    ):
+        LLM_SECONDS.labels(self.mode.value, self.model, status).observe(
+            time.time() - start_time
+        )
+        if prompt_tokens:
+            LLM_TOKENS.labels(self.mode.value, self.model, "prompt").inc(prompt_tokens)
+        if completion_tokens:
+            LLM_TOKENS.labels(self.mode.value, self.model, "completion").inc(
+                completion_tokens
+            )
+
+    async def close(self):
+        await self.client.close()
+
+
+def completion_kwargs() -> dict:
+    """
+    主模型请求的额外参数
+    """
+    return {
+        "reasoning_effort": (
+            translate_config.reasoning_effort
+            if translate_config.extra_body is not None
+            and translate_config.extra_body.get("thinking")
+            and translate_config.extra_body.get("thinking").get("type")
+            == "enabled"
+            else None
+        ),
+        "extra_body": translate_config.extra_body,
+    }
+
+
+def build_providers() -> Dict[Mode, Provider]:
+    providers = {
+        Mode.UPGRADE: Provider(
+            Mode.UPGRADE,
+            AsyncOpenAI(
+                api_key=translate_config.api_key,
+                base_url=translate_config.base_url,
+                http_client=build_http_client(),
+                # 429 交给 request_completion 处理，限流器和健康统计才能看到
+                max_retries=0,
+            ),
+            translate_config.model,
+            completion_kwargs(),
+            rpm=translate_config.rate_limit.rpm,
+            tpm=translate_config.rate_limit.tpm,
+        )
+    }
+    if translate_config.enable_backup:
+        providers[Mode.DOWNGRADE] = Provider(
+            Mode.DOWNGRADE,
+            AsyncOpenAI(
+                api_key=translate_config.backup_api_key,
+                base_url=translate_config.backup_base_url,
+                http_client=build_http_client(),
+                # 429 交给 request_completion 处理，限流器和健康统计才能看到
+                max_retries=0,
+            ),
+            translate_config.backup_model,
+            rpm=translate_config.rate_limit.backup_rpm,
+            tpm=translate_config.rate_limit.backup_tpm,
+        )
+    return providers
+
+
+async def request_completion(provider: Provider, messages: List[dict], **kwargs):
+    """
+    经过后端的限流器发送请求，遇到 429 时按 Retry-After 暂停后重试
+    """
+    estimated_tokens = estimate_messages_tokens(messages)
+    max_retries = translate_config.rate_limit.max_retries
+    for attempt in range(max_retries + 1):
+        async with provider.limiter.slot(estimated_tokens) as slot:
+            start_time = time.time()
+            try:
+                response = await provider.client.chat.completions.create(
+                    model=provider.model,
+                    messages=messages,
+                    temperature=translate_config.temperature,
+                    timeout=translate_config.timeout,
+                    **provider.completion_kwargs,
+                    **kwargs,
+                )
+            except RateLimitError as e:
+                provider.observe(start_time, "rate_limited")
+                slot.rate_limited(parse_retry_after(e.response.headers.get("retry-after")))
+                if attempt == max_retries:
+                    raise
+                continue
+            except Exception:
+                provider.observe(start_time, "error")
+                raise
+            usage = response.usage
+            if usage:
+                provider.observe(start_time, "ok", usage.prompt_tokens, usage.completion_tokens)
+            else:
+                provider.observe(start_time, "ok", estimated_tokens)
+            slot.done(usage.total_tokens if usage else estimated_tokens)
+            return response
+
+
+async def stream_completion(
+    provider: Provider, messages: List[dict], guard: OutputGuard, **kwargs
+) -> tuple[str, int]:
+    """
+    流式请求，返回 (完整输出, 消耗的 token)
+
+    guard 判定输出失控时关闭连接并抛出 RunawayOutputError，遇到 429 的处理同 request_completion
+    """
+    estimated_tokens = estimate_messages_tokens(messages)
+    max_retries = translate_config.rate_limit.max_retries
+    for attempt in range(max_retries + 1):
+        async with provider.limiter.slot(estimated_tokens) as slot:
+            start_time = time.time()
+            try:
+                stream = await provider.client.chat.completions.create(
+                    model=provider.model,
+                    messages=messages,
+                    temperature=translate_config.temperature,
+                    timeout=translate_config.timeout,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **provider.completion_kwargs,
+                    **kwargs,
+                )
+            except RateLimitError as e:
+                provider.observe(start_time, "rate_limited")
+                slot.rate_limited(parse_retry_after(e.response.headers.get("retry-after")))
+                if attempt == max_retries:
+                    raise
+                continue
+            except Exception:
+                provider.observe(start_time, "error")
+                raise
+            content = ""
+            usage = None
+            try:
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.usage:
+                            usage = chunk.usage
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if not delta:
+                            continue
+                        content += delta
+                        reason = guard.check(content, delta)
+                        if reason:
+                            provider.observe(
+                                start_time, "aborted", estimated_tokens, guard.output_tokens
+                            )
+                            used_tokens = estimated_tokens + guard.output_tokens
+                            slot.done(used_tokens)
+                            raise RunawayOutputError(reason, used_tokens)
+            except RunawayOutputError:
+                raise
+            except Exception:
+                provider.observe(start_time, "error")
+                raise
+            if usage:
+                provider.observe(start_time, "ok", usage.prompt_tokens, usage.completion_tokens)
+                total_tokens = usage.total_tokens
+            else:
+                provider.observe(start_time, "ok", estimated_tokens, guard.output_tokens)
+                total_tokens = estimated_tokens + guard.output_tokens
+            slot.done(total_tokens)
+            return content, total_tokens
+
+
+def system_prompt(
+    target_language: str,
+    terms: Optional[Dict[str, str]] = None,
+    strict: bool = False,
+) -> str:
+    # return f"你是专业的 Minecraft 中文翻译助手，接地气地直接地将文本翻译为{target_language}给我，文本背景是 Minecraft Mod 介绍，特有名词不要翻译"
+    prompt = f"Translate the introduction text of a Minecraft Mod into {target_language}. Do not translate mod-specific terms. Translate vanilla Minecraft item names according to the {target_language} Minecraft Wiki. No explanations, no additional notes, only the translated text.{glossary_prompt(terms)}"
+    if strict:
+        prompt += f" Translate every sentence into {target_language}, leaving none in the original language. Keep every URL, placeholder such as %s or {{0}}, formatting code and Markdown syntax exactly as in the original."
+    return prompt
+
+
+def estimate_text_tokens(
+    text: str, target_language: str = translate_config.target_language
+) -> int:
+    return estimate_translation_tokens(
+        text, estimate_tokens(system_prompt(target_language, find_terms([text])))
+    )
 
 
 def post_processing_text(translated_text: str) -> str:
@@ -42,6 +284,7 @@ def post_processing_text(translated_text: str) -> str:
     - 为中英文之间添加空格
     - 替换关键字
     """
+    start_time = time.time()
     translated_text = translated_text.strip()
     translated_text = translated_text.strip("\n")
 
@@ -61,69 +304,86 @@ def post_processing_text(translated_text: str) -> str:
     )
 
     # 添加更多替换规则
+    POSTPROCESS_SECONDS.labels("post_processing").observe(time.time() - start_time)
     return translated_text
 
 
-def translate_text(
+async def translate_text(
     text,
+    providers: Dict[Mode, Provider],
     target_language: str = translate_config.target_language,
     mode: Mode = Mode.UPGRADE,
-) -> tuple[Optional[str], int]:
+    strict: bool = False,
+) -> tuple[Optional[str], int, Optional[Provider]]:
+    """
+    返回 (译文, 消耗的 token, 实际使用的后端)，mode 为首选后端，strict 时使用更严格的提示词
+
+    流式模式下输出过长或夹带说明时提前中断并重试，被中断请求的 token 同样计入消耗
+    """
+    wasted_tokens = 0
     try:
         message = [
             {
                 "role": "system",
-                # "content": f"你是专业的 Minecraft 中文翻译助手，接地气地直接地将文本翻译为{target_language}给我，文本背景是 Minecraft Mod 介绍，特有名词不要翻译",
-                "content": f"Translate the introduction text of a Minecraft Mod into {target_language}. Do not translate mod-specific terms. Translate vanilla Minecraft item names according to the {target_language} Minecraft Wiki. No explanations, no additional notes, only the translated text.",
+                "content": system_prompt(target_language, find_terms([text]), strict),
             },
             {"role": "user", "content": text},
         ]
-        if mode == Mode.DOWNGRADE:
-            if not BACKUP_CLIENT:
-                log.warning("Backup client is not available.")
-                return None, 0
-            response = BACKUP_CLIENT.chat.completions.create(
-                model=translate_config.backup_model,
-                messages=message,
-                temperature=translate_config.temperature,
-                timeout=60,
+        if not translate_config.stream:
+            response, provider = await routed_request(
+                providers, mode, lambda provider: request_completion(provider, message)
             )
-        else:
-            response = CLIENT.chat.completions.create(
-                model=translate_config.model,
-                messages=message,
-                temperature=translate_config.temperature,
-                reasoning_effort=(
-                    translate_config.reasoning_effort
-                    if translate_config.extra_body is not None
-                    and translate_config.extra_body.get("thinking")
-                    and translate_config.extra_body.get("thinking").get("type")
-                    == "enabled"
-                    else None
-                ),
-                extra_body=translate_config.extra_body,
-                timeout=60,
-            )
-        if response:
-            translated_text = response.choices[0].message.content
-            usage = response.usage
-            translated_text = post_processing_text(translated_text)
-            return translated_text, usage.total_tokens
-        else:
-            raise Exception("Failed to get response from API")
+            if response:
+                translated_text = response.choices[0].message.content
+                usage = response.usage
+                translated_text = post_processing_text(translated_text)
+                return translated_text, usage.total_tokens, provider
+            else:
+                raise Exception("Failed to get response from API")
+
+        for attempt in range(translate_config.stream_retries + 1):
+            aborted: List[RunawayOutputError] = []
+
+            async def request(provider: Provider):
+                try:
+                    return await stream_completion(provider, message, OutputGuard(text))
+                except RunawayOutputError as e:
+                    aborted.append(e)
+                    raise
+
+            try:
+                (translated_text, total_tokens), provider = await routed_request(
+                    providers, mode, request
+                )
+            except RunawayOutputError as e:
+                log.warning(
+                    f"Translation output aborted ({e.reason}), attempt {attempt + 1} of {translate_config.stream_retries + 1}."
+                )
+                continue
+            finally:
+                wasted_tokens += sum(e.used_tokens for e in aborted)
+            return post_processing_text(translated_text), total_tokens + wasted_tokens, provider
+        raise Exception("Translation output aborted on every attempt")
     except Exception as e:
         log.error(e)
-        return None, 0
+        return None, wasted_tokens, None
 
 
-def process_translation(
-    translation: Translation, mode: Mode
+async def process_translation(
+    translation: Translation,
+    mode: Mode,
+    providers: Dict[Mode, Provider],
 ) -> tuple[Optional[Translation], int]:
     start_time = time.time()
     log.debug(f"Translating {translation.model_dump()}...")
-    translated_text, total_tokens = translate_text(translation.original_text, mode=mode)
+    translated_text, total_tokens, provider = await translate_text(
+        translation.original_text, providers, mode=mode
+    )
     if translated_text:
         translation.translated_text = translated_text
+        translation.mode = provider.mode
+        translation.model = provider.model
+        translation.used_tokens = total_tokens
         log.debug(
             f"Translated {translation.model_dump()} with {total_tokens} tokens in {round(time.time() - start_time, 2)} seconds."
         )
@@ -132,86 +392,55 @@ def process_translation(
         log.error(
             f"Failed to translate {translation.model_dump()} in {time.time() - start_time} seconds."
         )
-        return None, 0
+        return None, total_tokens
 
 
-def process_multi_translations(
-    translations: List[Translation],
-) -> tuple[List[Translation], List[Translation], int]:
-    failed_jobs: List[Translation] = []
-    final_failed_jobs: List[Translation] = []
-    success_jobs: List[Translation] = []
-    total_used_token = 0
+def translated_collection_name(platform: Platform) -> str:
+    if platform == Platform.MODRINTH:
+        return "modrinth_translated"
+    return "curseforge_translated"
 
-    log.info(f"Translating {len(translations)} texts with multithreading...")
 
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = {
-            executor.submit(process_translation, translation, Mode.UPGRADE): translation
-            for translation in translations
-        }
+def build_translation_update(translation: Translation) -> UpdateOne:
+    """
+    只在原文未变化时写入，不新建记录
 
-        for future in as_completed(futures):
-            translation = futures[future]
-            try:
-                result, tokens = future.result()
-                if result:
-                    success_jobs.append(result)
-                    total_used_token += tokens
-                else:
-                    if translate_config.enable_backup:
-                        failed_jobs.append(translation)
-            except Exception as e:
-                log.error(
-                    f"Error processing translation {translation.model_dump()}: {e}"
-                )
-                if translate_config.enable_backup:
-                    failed_jobs.append(translation)
-
-    log.info(f"Translated {len(translations)} texts, failed {len(failed_jobs)}")
-
-    # if len(failed_jobs) > 0 and translate_config.enbale_backup:
-    #     with ThreadPoolExecutor(max_workers=translate_config.max_threads) as executor:
-    #         futures = {executor.submit(process_translation, translation, Mode.DOWNGRADE): translation for translation in failed_jobs}
-    #         for future in as_completed(futures):
-    #             translation = futures[future]
-    #             try:
-    #                 result, tokens = future.result()
-    #                 if result:
-    #                     success_jobs.append(result)
-    #                     total_used_token += tokens
-    #                     log.debug(
-    #                         f"Translated {translation.model_dump()} with downgrade model, used {tokens} tokens."
-    #                     )
-    #                 else:
-    #                     final_failed_jobs.append(translation)
-    #                     log.error(
-    #                         f"Failed to translate {translation.model_dump()} with downgrade model."
-    #                     )
-    #             except Exception as e:
-    #                 log.error(f"Error processing translation {translation.model_dump()} with downgrade model: {e}")
-    #                 final_failed_jobs.append(translation)
-    # else:
-    #     final_failed_jobs = failed_jobs
-
-    return success_jobs, final_failed_jobs, total_used_token
-
-
-def update_translation(translation: Translation):
-    if translation.platform == Platform.MODRINTH:
-        collection = database.get_collection("modrinth_translated")
-    else:
-        collection = database.get_collection("curseforge_translated")
-    collection.update_one(
-        {"_id": translation.id},
-        {
-            "$set": {
-                "translated": translation.translated_text,
-                "original": translation.original_text,
-                "translated_at": datetime.now(),
-                "need_to_update": False,
-                # "translated_model":
-            }
+    译文在写回缓存或本地日志中等待期间原文被修改时不写入，保留新原文和 need_to_update 留给下次翻译
+    """
+    segments = translation.segments or align_segments(
+        translation.original_text, translation.translated_text
+    )
+    update = {
+        "$set": {
+            "translated": translation.translated_text,
+            "original": translation.original_text,
+            "translated_at": datetime.now(),
+            "need_to_update": False,
+            "segments": (
+                [segment.model_dump() for segment in segments] if segments else None
+            ),
+            "translated_model": translation.model,
+        },
+        "$unset": {
+            "claimed_by": "",
+            "lease_id": "",
+            "lease_expires_at": "",
+            "retry_after": "",
+            "failed_count": "",
+            "quality_issues": "",
+            # 新译文写入后，之前批量重译的质量检查结果不再适用
+            "migration_quality_issues": "",
         },
-        upsert=True,
+    }
+    if translation.skip_reason:
+        update["$set"]["skip_reason"] = translation.skip_reason
+    else:
+        update["$unset"]["skip_reason"] = ""
+    return UpdateOne({"_id": translation.id, "original": translation.original_text}, update)
+
+
+async def update_translation(translation: Translation, database: AsyncDatabase):
+    collection = database.get_collection(
+        translated_collection_name(translation.platform)
     )
+    await collection.bulk_write([build_translation_update(translation)])
@@ -0,0 +1,168 @@
+from typing import Dict, List, Optional
+import json
+import time
+
+from mcim_translate.translate import (
+    Translation,
+    Provider,
+    system_prompt,
+    post_processing_text,
+    process_translation,
+    request_completion,
+    translate_config,
+)
+from mcim_translate.translate.glossary import find_terms
+from mcim_translate.translate.router import routed_request
+from mcim_translate.translate.memory import MemoryStats, TranslationMemory
+from mcim_translate.constants import Mode
+from mcim_translate.logger import log
+
+
+def batch_system_prompt(target_language: str, terms: Optional[Dict[str, str]] = None) -> str:
+    return (
+        f"{system_prompt(target_language, terms)}\n"
+        "The input is a JSON object whose values are separate texts keyed by ID. "
+        "Translate every value independently and reply with a JSON object that has exactly the same keys, "
+        "each mapped to its translated text."
+    )
+
+
+async def translate_batch_text(
+    texts: Dict[str, str],
+    providers: Dict[Mode, Provider],
+    target_language: str = translate_config.target_language,
+    mode: Mode = Mode.UPGRADE,
+) -> tuple[Dict[str, str], int, Optional[Provider]]:
+    """
+    将多条文本打包为一个请求翻译
+
+    返回 (按 ID 校验通过的译文, 消耗的 token, 实际使用的后端)，缺失或无效的 ID 不会出现在结果中
+    """
+    messages = [
+        {
+            "role": "system",
+            "content": batch_system_prompt(target_language, find_terms(texts.values())),
+        },
+        {"role": "user", "content": json.dumps(texts, ensure_ascii=False)},
+    ]
+    try:
+        response, provider = await routed_request(
+            providers,
+            mode,
+            lambda provider: request_completion(
+                provider, messages, response_format={"type": "json_object"}
+            ),
+        )
+    except Exception as e:
+        log.error(e)
+        return {}, 0, None
+
+    total_tokens = response.usage.total_tokens if response.usage else 0
+    try:
+        data = json.loads(response.choices[0].message.content)
+    except (TypeError, ValueError) as e:
+        log.warning(f"Invalid JSON in batch response: {e}")
+        return {}, total_tokens, provider
+    if not isinstance(data, dict):
+        log.warning(f"Batch response is not a JSON object: {type(data)}")
+        return {}, total_tokens, provider
+
+    results: Dict[str, str] = {}
+    for key in texts:
+        value = data.get(key)
+        if isinstance(value, str) and value.strip():
+            results[key] = post_processing_text(value)
+    if len(results) < len(texts):
+        log.warning(
+            f"Batch response missing {len(texts) - len(results)} of {len(texts)} ids."
+        )
+    return results, total_tokens, provider
+
+
+async def process_batch_translations(
+    translations: List[Translation],
+    mode: Mode,
+    providers: Dict[Mode, Provider],
+    memory: Optional[TranslationMemory] = None,
+    memory_stats: Optional[MemoryStats] = None,
+) -> tuple[List[Translation], List[Translation], int]:
+    """
+    批量翻译，失败的部分对半拆分后重试，直到退化为逐条翻译
+
+    - 先查翻译记忆，命中的不再请求，命中情况计入 memory_stats；新译文由调用方检查质量后写入翻译记忆
+    - 请求消耗的 token 按原文长度分摊到每条记录的 used_tokens
+    """
+    if memory is not None:
+        remembered = await memory.get_many(
+            (t.original_text for t in translations), memory_stats
+        )
+        memory_jobs: List[Translation] = []
+        pending_jobs: List[Translation] = []
+        for translation in translations:
+            if translation.original_text in remembered:
+                translation.translated_text, translation.model = remembered[
+                    translation.original_text
+                ]
+                translation.from_memory = True
+                translation.used_tokens = 0
+                memory_jobs.append(translation)
+            else:
+                pending_jobs.append(translation)
+        success_jobs, failed_jobs, total_tokens = await process_batch_translations(
+            pending_jobs, mode, providers
+        )
+        return memory_jobs + success_jobs, failed_jobs, total_tokens
+
+    if not translations:
+        return [], [], 0
+    if len(translations) == 1:
+        result, tokens = await process_translation(translations[0], mode, providers)
+        if result:
+            return [result], [], tokens
+        return [], translations, tokens
+
+    start_time = time.time()
+    texts = {str(index): t.original_text for index, t in enumerate(translations)}
+    translated, total_tokens, provider = await translate_batch_text(
+        texts, providers, mode=mode
+    )
+
+    success_jobs: List[Translation] = []
+    failed_jobs: List[Translation] = []
+    total_length = sum(len(t.original_text) for t in translations) or 1
+    for index, translation in enumerate(translations):
+        text: Optional[str] = translated.get(str(index))
+        if text:
+            translation.translated_text = text
+            translation.mode = provider.mode
+            translation.model = provider.model
+            translation.used_tokens = round(
+                total_tokens * len(translation.original_text) / total_length
+            )
+            success_jobs.append(translation)
+        else:
+            failed_jobs.append(translation)
+
+    log.debug(
+        f"Translated batch of {len(translations)} with {total_tokens} tokens "
+        f"({round(total_tokens / len(translations), 1)} per item) in {round(time.time() - start_time, 2)} seconds, "
+        f"{len(failed_jobs)} failed."
+    )
+
+    if failed_jobs:
+        # 所有 ID 都缺失时对半拆分，否则只重试缺失部分
+        if len(failed_jobs) == len(translations):
+            middle = len(failed_jobs) // 2
+            parts = [failed_jobs[:middle], failed_jobs[middle:]]
+        else:
+            parts = [failed_jobs]
+        failed_jobs = []
+        for part in parts:
+            part_success, part_failed, part_tokens = await process_batch_translations(
+                part, mode, providers
+            )
+            success_jobs.extend(part_success)
+            failed_jobs.extend(part_failed)
+            total_tokens += part_tokens
+
+    return success_jobs, failed_jobs, total_tokens
@@ -0,0 +1,152 @@
+from typing import Dict, Iterable, List, Optional
+from functools import lru_cache
+import json
+import os
+
+from mcim_translate.config import Config
+from mcim_translate.logger import log
+
+translate_config = Config.load().translate
+
+
+def _lower(text: str) -> str:
+    # 保证逐字符转小写后长度不变，匹配位置才能对应回原文
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+class Glossary:
+    """
+    原版物品名称术语表，基于 Aho-Corasick 自动机
+
+    - 大小写不敏感
+    - 只匹配完整单词
+    - 重叠时优先取最长的匹配
+    """
+
+    def __init__(self, table: Dict[str, str]):
+        self.table: Dict[str, tuple[str, str]] = {
+            _lower(term): (term, translated) for term, translated in table.items() if term
+        }
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+        for term in self.table:
+            self._insert(term)
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def _insert(self, term: str):
+        node = 0
+        for c in term:
+            next_node = self._goto[node].get(c)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][c] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(len(term))
+
+    def _build(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for c, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(c, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_terms(self, text: str) -> Dict[str, str]:
+        """
+        返回文本中出现的术语 -> 译名，键为术语表中的原始写法
+        """
+        lowered = _lower(text)
+        matches: List[tuple[int, int]] = []
+        node = 0
+        for index, c in enumerate(lowered):
+            while node and c not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(c, 0)
+            for length in self._output[node]:
+                start = index - length + 1
+                end = index + 1
+                if start > 0 and _is_word_char(lowered[start - 1]):
+                    continue
+                if end < len(lowered) and _is_word_char(lowered[end]):
+                    continue
+                matches.append((start, end))
+
+        terms: Dict[str, str] = {}
+        occupied = [False] * len(lowered)
+        for start, end in sorted(matches, key=lambda m: (m[0] - m[1], m[0])):
+            if any(occupied[start:end]):
+                continue
+            occupied[start:end] = [True] * (end - start)
+            term, translated = self.table[lowered[start:end]]
+            terms[term] = translated
+        return terms
+
+    def find_terms_many(self, texts: Iterable[str]) -> Dict[str, str]:
+        terms: Dict[str, str] = {}
+        for text in texts:
+            terms.update(self.find_terms(text))
+        return terms
+
+
+def find_terms(texts: Iterable[str], max_terms: int = translate_config.glossary_max_terms) -> Dict[str, str]:
+    """
+    查找文本中出现的术语，最多返回 max_terms 个
+    """
+    glossary = get_glossary()
+    if glossary is None:
+        return {}
+    terms = glossary.find_terms_many(texts)
+    return dict(list(terms.items())[:max_terms])
+
+
+def glossary_prompt(terms: Dict[str, str]) -> str:
+    """
+    只注入文本中出现的术语，避免把整张表塞进提示词
+    """
+    if not terms:
+        return ""
+    lines = [f"{term} => {translated}" for term, translated in terms.items()]
+    return (
+        " When these vanilla Minecraft names appear, translate them exactly as follows:\n"
+        + "\n".join(lines)
+    )
+
+
+def missing_terms(translated_text: str, terms: Dict[str, str]) -> List[str]:
+    """
+    译后检查：返回译文中没有使用指定译名的术语
+    """
+    return [
+        term
+        for term, translated in terms.items()
+        if translated not in translated_text
+    ]
+
+
+@lru_cache(maxsize=1)
+def get_glossary(path: str = translate_config.glossary_path) -> Optional[Glossary]:
+    if not path or not os.path.exists(path):
+        log.warning(f"Glossary file {path} not found, glossary disabled.")
+        return None
+    with open(path, "r", encoding="UTF-8") as fd:
+        table = json.load(fd)
+    glossary = Glossary(table)
+    log.info(f"Loaded {len(glossary)} glossary terms from {path}.")
+    return glossary
@@ -0,0 +1,70 @@
+from typing import Optional
+import math
+import re
+
+from mcim_translate.config import Config
+from mcim_translate.translate.tokens import estimate_tokens
+
+translate_config = Config.load().translate
+
+# 模型在译文之外附加的说明，只检查行首或括号开头
+COMMENTARY = re.compile(
+    r"(?:^|[(（])\s*(?:"
+    r"note|notes|translation|translated text|translator'?s note|explanation"
+    r"|注|注释|译注|译者注|翻译|译文"
+    r")\s*[:：]",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# 原文本身带有这些标记时，译文中出现对应的译法是正常的
+ORIGINAL_LABEL = re.compile(
+    r"(?:^|[(\[])\s*(?:note|notes|translation|explanation)\b",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+class RunawayOutputError(Exception):
+    """
+    流式输出被提前中断，used_tokens 为中断前估算消耗的 token
+    """
+
+    def __init__(self, reason: str, used_tokens: int):
+        super().__init__(f"Aborted runaway output: {reason}")
+        self.reason = reason
+        self.used_tokens = used_tokens
+
+
+class OutputGuard:
+    """
+    流式输出检查
+
+    - 输出 token 超过原文的 stream_output_ratio 倍（不少于 stream_min_output_tokens）时中断
+    - 出现 "Note:"、"翻译：" 等说明性文字时中断，原文本身带有此类标记时不检查
+    """
+
+    def __init__(
+        self,
+        text: str,
+        check_commentary: bool = True,
+        ratio: float = translate_config.stream_output_ratio,
+        min_output_tokens: int = translate_config.stream_min_output_tokens,
+    ):
+        self.max_output_tokens = max(
+            min_output_tokens, math.ceil(estimate_tokens(text) * ratio)
+        )
+        self.check_commentary = check_commentary and not ORIGINAL_LABEL.search(text)
+        self.output_tokens = 0
+
+    def check(self, content: str, delta: str) -> Optional[str]:
+        """
+        content 为包含 delta 的完整输出，返回中断原因，无需中断时返回 None
+        """
+        self.output_tokens += estimate_tokens(delta)
+        if self.output_tokens > self.max_output_tokens:
+            return "length"
+        if self.check_commentary:
+            # 只检查新内容所在的行，避免每次重复扫描全部输出
+            start = content.rfind("\n", 0, len(content) - len(delta))
+            if COMMENTARY.search(content, max(start, 0)):
+                return "commentary"
+        return None
@@ -0,0 +1,82 @@
+from typing import Dict, Optional
+import time
+
+from mcim_translate.translate import Translation, Provider, translate_text
+from mcim_translate.translate.batch import translate_batch_text
+from mcim_translate.translate.segment import (
+    Segment,
+    split_segments,
+    normalize_segment,
+    join_segments,
+)
+from mcim_translate.constants import Mode
+from mcim_translate.logger import log
+
+
+async def process_incremental_translation(
+    translation: Translation, mode: Mode, providers: Dict[Mode, Provider]
+) -> tuple[Optional[Translation], int]:
+    """
+    原文修改后只翻译变化的句子，未变化的句子复用上次保存的句子对
+
+    没有可复用的句子或翻译失败时返回 None，由调用方走整段翻译
+    """
+    if not translation.previous_segments:
+        return None, 0
+    sentences, separators = split_segments(translation.original_text)
+    if len(sentences) < 2:
+        return None, 0
+
+    start_time = time.time()
+    known = {
+        normalize_segment(segment.original): segment.translated
+        for segment in translation.previous_segments
+    }
+    changed = {
+        str(index): sentence
+        for index, sentence in enumerate(sentences)
+        if normalize_segment(sentence) not in known
+    }
+    if len(changed) == len(sentences):
+        return None, 0
+
+    total_tokens = 0
+    provider: Optional[Provider] = None
+    translated: Dict[str, str] = {}
+    if len(changed) == 1:
+        key, sentence = next(iter(changed.items()))
+        text, total_tokens, provider = await translate_text(
+            sentence, providers, mode=mode
+        )
+        if text:
+            translated[key] = text
+    elif changed:
+        translated, total_tokens, provider = await translate_batch_text(
+            changed, providers, mode=mode
+        )
+    if len(translated) < len(changed):
+        log.debug(
+            f"Incremental translation failed for {translation.platform.value} {translation.id}, falling back to full translation."
+        )
+        return None, total_tokens
+
+    pieces = [
+        translated[str(index)]
+        if str(index) in changed
+        else known[normalize_segment(sentence)]
+        for index, sentence in enumerate(sentences)
+    ]
+    translation.translated_text = join_segments(pieces, separators)
+    translation.segments = [
+        Segment(original=sentence, translated=piece)
+        for sentence, piece in zip(sentences, pieces)
+    ]
+    if provider is not None:
+        translation.mode = provider.mode
+        translation.model = provider.model
+    translation.used_tokens = total_tokens
+    log.debug(
+        f"Incrementally translated {translation.platform.value} {translation.id}: "
+        f"{len(changed)} of {len(sentences)} segments changed, {total_tokens} tokens in {round(time.time() - start_time, 2)} seconds."
+    )
+    return translation, total_tokens
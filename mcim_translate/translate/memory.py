@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from pymongo import UpdateOne
+from pymongo.asynchronous.database import AsyncDatabase
+from typing import Dict, Iterable, List, Optional
+from datetime import datetime
+import hashlib
+import re
+
+from mcim_translate.config import Config
+from mcim_translate.logger import log
+
+translate_config = Config.load().translate
+
+MEMORY_COLLECTION = "translation_memory"
+
+
+def normalize_text(text: str) -> str:
+    """
+    归一化原文：去掉首尾空白，合并连续空白
+    """
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_hash(text: str, target_language: str = translate_config.target_language) -> str:
+    normalized = normalize_text(text)
+    return hashlib.sha256(f"{target_language}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class MemoryStats:
+    """
+    翻译记忆的命中统计
+    """
+
+    def __init__(self):
+        self.lru_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def add(self, lru_hits: int, db_hits: int, misses: int):
+        self.lru_hits += lru_hits
+        self.db_hits += db_hits
+        self.misses += misses
+
+    @property
+    def lookups(self) -> int:
+        return self.lru_hits + self.db_hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return round((self.lru_hits + self.db_hits) / self.lookups, 4) if self.lookups else 0.0
+
+
+class TranslationMemory:
+    """
+    精确匹配的翻译记忆，跨平台共享
+
+    进程内 LRU 在前，MongoDB translation_memory 集合在后，键为归一化原文的 sha256
+
+    每条记忆保存 (译文, 翻译所用的模型)，命中时沿用原来的模型
+
+    stats 是进程内所有查询的累计命中统计，单次运行的统计由调用方传入自己的 MemoryStats
+    """
+
+    def __init__(self, database: AsyncDatabase, capacity: int = translate_config.memory_size):
+        self.collection = database.get_collection(MEMORY_COLLECTION)
+        self.capacity = max(0, capacity)
+        self._lru: OrderedDict[str, tuple[str, Optional[str]]] = OrderedDict()
+        self.stats = MemoryStats()
+        self._pending: List[UpdateOne] = []
+
+    def _remember(self, key: str, translated: str, model: Optional[str]):
+        if self.capacity == 0:
+            return
+        self._lru[key] = (translated, model)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    async def get_many(
+        self, texts: Iterable[str], stats: Optional[MemoryStats] = None
+    ) -> Dict[str, tuple[str, Optional[str]]]:
+        """
+        返回 原文 -> (译文, 模型)，未命中的原文不在结果中；命中情况同时计入 self.stats 和传入的 stats
+        """
+        results: Dict[str, tuple[str, Optional[str]]] = {}
+        missing: Dict[str, str] = {}
+        lru_hits = 0
+        db_hits = 0
+        for text in texts:
+            key = text_hash(text)
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                results[text] = self._lru[key]
+                lru_hits += 1
+            else:
+                missing[key] = text
+
+        if missing:
+            async for doc in self.collection.find(
+                {"_id": {"$in": list(missing.keys())}},
+                {"_id": 1, "translated": 1, "model": 1},
+            ):
+                text = missing.pop(doc["_id"])
+                results[text] = (doc["translated"], doc.get("model"))
+                self._remember(doc["_id"], doc["translated"], doc.get("model"))
+                db_hits += 1
+        for counter in (self.stats, stats):
+            if counter is not None:
+                counter.add(lru_hits, db_hits, len(missing))
+        return results
+
+    async def put(self, text: str, translated: str, model: Optional[str] = None):
+        """
+        写入 LRU，数据库写入先缓存，攒够 write_batch_size 条后批量写入
+        """
+        key = text_hash(text)
+        self._remember(key, translated, model)
+        self._pending.append(
+            UpdateOne(
+                {"_id": key},
+                {
+                    "$set": {
+                        "original": normalize_text(text),
+                        "translated": translated,
+                        "model": model,
+                        "updated_at": datetime.now(),
+                    }
+                },
+                upsert=True,
+            )
+        )
+        if len(self._pending) >= translate_config.write_batch_size:
+            await self.flush()
+
+    async def flush(self):
+        operations, self._pending = self._pending, []
+        if not operations:
+            return
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            # 翻译记忆只是缓存，写入失败不影响译文写回
+            log.warning(f"Failed to write {len(operations)} translation memory entries: {e}")
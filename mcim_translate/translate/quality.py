@@ -0,0 +1,81 @@
+from collections import Counter
+from typing import List
+import re
+
+from mcim_translate.config import Config
+from mcim_translate.translate.segment import split_segments, normalize_segment
+
+quality_config = Config.load().translate.quality
+
+_CJK = re.compile(r"[\u4e00-\u9fa5]")
+_LATIN = re.compile(r"[A-Za-z]")
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_URL = re.compile(r"https?://[\w\-.~:/?#@!$&*+,;=%]+", re.ASCII | re.IGNORECASE)
+_URL_TRAILING = ".,;:!?"
+# 格式化占位符与 Minecraft 颜色代码
+_PLACEHOLDER = re.compile(r"%(?:\d+\$)?[sdf]|\{\w*\}|§[0-9a-fk-or]", re.IGNORECASE)
+_CODE = re.compile(r"```.*?```|`[^`\n]+`", re.DOTALL)
+# Markdown 结构：代码块、链接与图片、标题、加粗
+_MARKDOWN = {
+    "code_fence": re.compile(r"```"),
+    "link": re.compile(r"\]\("),
+    "heading": re.compile(r"^\s*#{1,6}\s", re.MULTILINE),
+    "bold": re.compile(r"\*\*"),
+}
+
+
+def _urls(text: str) -> List[str]:
+    return [url.rstrip(_URL_TRAILING) for url in _URL.findall(text)]
+
+
+def _prose(text: str) -> str:
+    """
+    去掉链接、代码与占位符，只保留需要翻译的文字
+    """
+    return _PLACEHOLDER.sub("", _URL.sub("", _CODE.sub("", text)))
+
+
+def check_translation(original: str, translated: str) -> List[str]:
+    """
+    本地检查译文质量，返回问题列表，没有问题时返回空列表
+
+    - length_ratio：译文与原文的长度比超出范围
+    - target_script：去掉链接、代码后汉字占字母的比例过低
+    - untranslated：原文中较长的句子原样出现在译文中
+    - placeholder / url / markdown：占位符、链接或 Markdown 结构丢失
+    """
+    issues: List[str] = []
+    original_prose = _prose(original)
+    translated_prose = _prose(translated)
+    checkable = len(_LATIN.findall(original_prose)) >= quality_config.min_length
+
+    if checkable:
+        ratio = len(translated_prose.strip()) / max(len(original_prose.strip()), 1)
+        if not quality_config.min_length_ratio <= ratio <= quality_config.max_length_ratio:
+            issues.append("length_ratio")
+
+        cjk = len(_CJK.findall(translated_prose))
+        latin = len(_LATIN.findall(translated_prose))
+        if cjk / max(cjk + latin, 1) < quality_config.min_target_ratio:
+            issues.append("target_script")
+
+    # 与原文一样去掉链接、代码和占位符后再比较，否则含链接的句子原样保留时无法匹配
+    normalized = normalize_segment(translated_prose)
+    sentences, _ = split_segments(original_prose)
+    if any(
+        len(_WORD.findall(sentence)) >= quality_config.untranslated_words
+        and normalize_segment(sentence) in normalized
+        for sentence in sentences
+    ):
+        issues.append("untranslated")
+
+    if Counter(_PLACEHOLDER.findall(original)) - Counter(_PLACEHOLDER.findall(translated)):
+        issues.append("placeholder")
+    if set(_urls(original)) - set(_urls(translated)):
+        issues.append("url")
+    if any(
+        len(pattern.findall(original)) != len(pattern.findall(translated))
+        for pattern in _MARKDOWN.values()
+    ):
+        issues.append("markdown")
+    return issues
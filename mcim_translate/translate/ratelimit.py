@@ -0,0 +1,179 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Deque, Optional
+from datetime import datetime, timezone
+import asyncio
+import time
+
+from mcim_translate.config import Config
+from mcim_translate.logger import log
+
+rate_limit_config = Config.load().translate.rate_limit
+
+WINDOW_SECONDS = 60
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 响应头，支持秒数和 HTTP 日期两种格式
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class Slot:
+    """
+    一次请求占用的名额，请求结束后通过 done / rate_limited / failed 报告结果
+    """
+
+    def __init__(self, limiter: "AdaptiveLimiter", token_record: list):
+        self.limiter = limiter
+        # [请求时间, token 数]，完成后修正为实际用量
+        self.token_record = token_record
+        self.start_time = time.time()
+        self.reported = False
+
+    def done(self, total_tokens: int):
+        self.reported = True
+        self.limiter._on_success(self, total_tokens)
+
+    def rate_limited(self, retry_after: Optional[float] = None):
+        self.reported = True
+        self.limiter._on_rate_limited(retry_after)
+
+    def failed(self):
+        self.reported = True
+        self.limiter._on_failure(self)
+
+
+class AdaptiveLimiter:
+    """
+    单个翻译后端的并发与速率控制
+
+    - 并发上限按 AIMD 调整：成功且延迟低于 latency_target 时缓慢增加，遇到 429 时按 decrease_factor 减半
+    - 遇到 429 时整个后端暂停 Retry-After 秒（没有时使用 default_retry_after）
+    - 按滑动窗口限制每分钟请求数 rpm 和 token 数 tpm，token 先按估算值占用，完成后按实际用量修正
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = min(self.max_concurrency, max(1, rate_limit_config.min_concurrency))
+        self.limit = float(
+            min(
+                self.max_concurrency,
+                rate_limit_config.initial_concurrency or self.max_concurrency,
+            )
+        )
+        self.rpm = rpm
+        self.tpm = tpm
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.latency_ewma: Optional[float] = None
+        self.rate_limited_count = 0
+        self._requests: Deque[float] = deque()
+        self._tokens: Deque[list] = deque()
+        self._condition = asyncio.Condition()
+
+    @property
+    def concurrency(self) -> int:
+        return max(self.min_concurrency, int(self.limit))
+
+    def _trim(self, now: float):
+        while self._requests and now - self._requests[0] >= WINDOW_SECONDS:
+            self._requests.popleft()
+        while self._tokens and now - self._tokens[0][0] >= WINDOW_SECONDS:
+            self._tokens.popleft()
+
+    def _wait_time(self, estimated_tokens: int) -> Optional[float]:
+        """
+        返回还需等待的秒数，None 表示需要等待其他请求结束
+        """
+        now = time.time()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= self.concurrency:
+            return None
+        self._trim(now)
+        if self.rpm and len(self._requests) >= self.rpm:
+            return WINDOW_SECONDS - (now - self._requests[0])
+        if self.tpm and self._tokens:
+            used = sum(tokens for _, tokens in self._tokens)
+            if used + estimated_tokens > self.tpm:
+                return WINDOW_SECONDS - (now - self._tokens[0][0])
+        return 0
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int = 0) -> AsyncIterator[Slot]:
+        async with self._condition:
+            while True:
+                wait_time = self._wait_time(estimated_tokens)
+                if wait_time == 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._condition.wait(), wait_time)
+                except asyncio.TimeoutError:
+                    pass
+            self.in_flight += 1
+            now = time.time()
+            self._requests.append(now)
+            token_record = [now, estimated_tokens]
+            self._tokens.append(token_record)
+
+        slot = Slot(self, token_record)
+        try:
+            yield slot
+        finally:
+            if not slot.reported:
+                slot.failed()
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def _observe_latency(self, slot: Slot) -> float:
+        latency = time.time() - slot.start_time
+        self.latency_ewma = (
+            latency
+            if self.latency_ewma is None
+            else 0.8 * self.latency_ewma + 0.2 * latency
+        )
+        return latency
+
+    def _on_success(self, slot: Slot, total_tokens: int):
+        slot.token_record[1] = total_tokens
+        latency = self._observe_latency(slot)
+        if latency <= rate_limit_config.latency_target:
+            # 每轮满并发成功约增加 1
+            self.limit = min(self.max_concurrency, self.limit + 1 / max(self.limit, 1))
+        else:
+            self.limit = max(self.min_concurrency, self.limit - 1 / max(self.limit, 1))
+
+    def _on_failure(self, slot: Slot):
+        self._observe_latency(slot)
+
+    def _on_rate_limited(self, retry_after: Optional[float]):
+        self.rate_limited_count += 1
+        self.limit = max(self.min_concurrency, self.limit * rate_limit_config.decrease_factor)
+        pause = retry_after if retry_after is not None else rate_limit_config.default_retry_after
+        self.paused_until = max(self.paused_until, time.time() + pause)
+        log.warning(
+            f"{self.name} rate limited, pausing {round(pause, 2)} seconds, concurrency limit {self.concurrency}."
+        )
@@ -0,0 +1,250 @@
+from collections import defaultdict
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import httpx
+
+from mcim_translate.config import Config
+from mcim_translate.logger import log
+
+record_config = Config.load().translate.record
+
+# 回放时保留的响应头
+KEPT_HEADERS = ("content-type", "retry-after")
+
+
+def _canonical(data) -> str:
+    return json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def request_fingerprints(content: bytes) -> tuple[str, str]:
+    """
+    返回 (完整请求指纹, 只含用户消息的指纹)
+
+    修改提示词或参数后完整指纹会变化，回放时退回按用户消息匹配
+    """
+    body = json.loads(content or b"{}")
+    body.pop("stream_options", None)
+    user_messages = [
+        message.get("content")
+        for message in body.get("messages", [])
+        if message.get("role") == "user"
+    ]
+    return (
+        hashlib.sha256(_canonical(body).encode()).hexdigest(),
+        hashlib.sha256(_canonical(user_messages).encode()).hexdigest(),
+    )
+
+
+def _parse_usage(body: str) -> Optional[dict]:
+    if body.startswith("data:") or "\ndata:" in body:
+        for line in reversed(body.splitlines()):
+            if line.startswith("data:") and '"usage"' in line:
+                try:
+                    return json.loads(line[5:]).get("usage")
+                except ValueError:
+                    return None
+        return None
+    try:
+        return json.loads(body).get("usage")
+    except (ValueError, AttributeError):
+        return None
+
+
+class Recorder:
+    """
+    把请求指纹、响应、token 用量与耗时写入 gzip 压缩的 JSONL
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lines: List[str] = []
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, record: dict):
+        with self._lock:
+            self._lines.append(_canonical(record))
+            self.count += 1
+            if len(self._lines) >= 100:
+                self._flush()
+
+    def _flush(self):
+        if not self._lines:
+            return
+        # 追加写入新的 gzip 成员，读取时 gzip 会依次解压
+        with gzip.open(self.path, "at", encoding="UTF-8") as fd:
+            fd.write("\n".join(self._lines) + "\n")
+        self._lines = []
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    """
+    边转发边记录响应内容，不影响流式读取，未读完就关闭时标记为 aborted
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, recorder: Recorder, record: dict, start_time: float):
+        self.stream = stream
+        self.recorder = recorder
+        self.record = record
+        self.start_time = start_time
+        self.chunks: List[bytes] = []
+        self.finished = False
+        self.closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.stream:
+            self.chunks.append(chunk)
+            yield chunk
+        self.finished = True
+
+    async def aclose(self):
+        if self.closed:
+            return
+        self.closed = True
+        await self.stream.aclose()
+        body = b"".join(self.chunks).decode("UTF-8", errors="replace")
+        self.record.update(
+            body=body,
+            latency=round(time.time() - self.start_time, 4),
+            usage=_parse_usage(body),
+            # 客户端读到 [DONE] 后即关闭，不会读完分块结束标记
+            aborted=not self.finished and "data: [DONE]" not in body,
+        )
+        self.recorder.add(self.record)
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, recorder: Recorder, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.recorder = recorder
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        content = await request.aread()
+        fingerprint, user_fingerprint = request_fingerprints(content)
+        start_time = time.time()
+        response = await self.transport.handle_async_request(request)
+        record = {
+            "fingerprint": fingerprint,
+            "user_fingerprint": user_fingerprint,
+            "path": request.url.path,
+            "status": response.status_code,
+            "headers": {
+                key: value for key, value in response.headers.items() if key.lower() in KEPT_HEADERS
+            },
+            "ttfb": round(time.time() - start_time, 4),
+            "recorded_at": start_time,
+        }
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, self.recorder, record, start_time),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        self.recorder.flush()
+        await self.transport.aclose()
+
+
+class _ReplayStream(httpx.AsyncByteStream):
+    """
+    按记录的耗时（除以 speed）逐行返回响应内容，流式响应的各事件均匀分布在首字节之后
+    """
+
+    def __init__(self, record: dict, speed: float):
+        self.record = record
+        self.speed = speed
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        body: str = self.record.get("body", "")
+        lines = body.splitlines(keepends=True) or [""]
+        remaining = max(0.0, self.record.get("latency", 0) - self.record.get("ttfb", 0))
+        for line in lines:
+            if self.speed > 0 and remaining:
+                await asyncio.sleep(remaining / self.speed / len(lines))
+            yield line.encode()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    不访问网络，按请求指纹返回录制的响应
+
+    同一指纹录制了多次时依次返回，用完后重复最后一次；找不到记录时返回 404
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        self.speed = speed
+        self.by_fingerprint: Dict[str, List[dict]] = defaultdict(list)
+        self.by_user: Dict[str, List[dict]] = defaultdict(list)
+        self._served: Dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+        with gzip.open(path, "rt", encoding="UTF-8") as fd:
+            for line in fd:
+                if line.strip():
+                    record = json.loads(line)
+                    self.by_fingerprint[record["fingerprint"]].append(record)
+                    self.by_user[record["user_fingerprint"]].append(record)
+        log.info(f"Loaded {len(self.by_fingerprint)} recorded requests from {path}.")
+
+    def _next(self, key: str, records: List[dict]) -> dict:
+        index = self._served[key]
+        self._served[key] += 1
+        return records[min(index, len(records) - 1)]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        fingerprint, user_fingerprint = request_fingerprints(await request.aread())
+        if fingerprint in self.by_fingerprint:
+            record = self._next(fingerprint, self.by_fingerprint[fingerprint])
+        elif user_fingerprint in self.by_user:
+            record = self._next("user:" + user_fingerprint, self.by_user[user_fingerprint])
+        else:
+            self.misses += 1
+            return httpx.Response(
+                404, json={"error": {"message": "No recorded response for this request."}}
+            )
+        self.hits += 1
+        if self.speed > 0:
+            await asyncio.sleep(record.get("ttfb", 0) / self.speed)
+        return httpx.Response(
+            record["status"],
+            headers=record.get("headers", {}),
+            stream=_ReplayStream(record, self.speed),
+        )
+
+    async def aclose(self):
+        log.info(f"Replayed {self.hits} recorded requests, {self.misses} not found.")
+
+
+@lru_cache(maxsize=1)
+def get_recorder(path: str = record_config.path) -> Recorder:
+    return Recorder(path)
+
+
+def build_http_client() -> Optional[httpx.AsyncClient]:
+    """
+    按 translate.record.mode 返回录制或回放用的 HTTP 客户端，未启用时返回 None
+    """
+    if record_config.mode == "record":
+        return httpx.AsyncClient(
+            transport=RecordingTransport(get_recorder()), timeout=None
+        )
+    if record_config.mode == "replay":
+        if not os.path.exists(record_config.path):
+            raise FileNotFoundError(f"Recording {record_config.path} not found.")
+        return httpx.AsyncClient(
+            transport=ReplayTransport(record_config.path, record_config.speed), timeout=None
+        )
+    return None
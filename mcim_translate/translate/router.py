@@ -0,0 +1,137 @@
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+import asyncio
+import time
+
+from mcim_translate.config import Config
+from mcim_translate.constants import Mode
+from mcim_translate.logger import log
+
+router_config = Config.load().translate.router
+
+T = TypeVar("T")
+
+# 没有延迟数据时的默认延迟
+DEFAULT_LATENCY = 10.0
+
+
+class ProviderHealth:
+    """
+    翻译后端最近的延迟与错误率
+    """
+
+    def __init__(self, window: int = router_config.window):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+
+    def record(self, success: bool, latency: float):
+        self.outcomes.append(success)
+        if success:
+            self.latencies.append(latency)
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if len(self.latencies) < router_config.hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent))]
+
+    @property
+    def average_latency(self) -> float:
+        if not self.latencies:
+            return DEFAULT_LATENCY
+        return sum(self.latencies) / len(self.latencies)
+
+    def score(self) -> float:
+        """
+        越小越健康
+        """
+        return self.average_latency * (1 + router_config.error_penalty * self.error_rate)
+
+
+def rank_providers(providers: Dict[Mode, T], preferred: Mode) -> List[T]:
+    """
+    按健康分排序，指定的后端在分数上有 preferred_bias 的优势
+    """
+
+    def score(mode: Mode) -> float:
+        health: ProviderHealth = providers[mode].health
+        value = health.score()
+        return value * router_config.preferred_bias if mode == preferred else value
+
+    return [providers[mode] for mode in sorted(providers, key=score)]
+
+
+async def _attempt(provider, request: Callable[[object], Awaitable[object]]) -> tuple:
+    start_time = time.time()
+    try:
+        result = await request(provider)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        provider.health.record(False, time.time() - start_time)
+        raise
+    provider.health.record(True, time.time() - start_time)
+    return result, provider
+
+
+async def _cancel(task: asyncio.Task):
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+
+
+async def routed_request(
+    providers: Dict[Mode, T],
+    preferred: Mode,
+    request: Callable[[T], Awaitable[object]],
+) -> tuple[object, T]:
+    """
+    按健康分选择后端发送请求，返回 (请求结果, 实际使用的后端)
+
+    - 请求超过最健康后端的 p95 延迟仍未返回时，向下一个后端发送对冲请求，取先成功的结果并取消另一个
+    - 请求失败时改由尚未尝试的最健康后端重试
+    """
+    candidates = rank_providers(providers, preferred)
+    if not candidates:
+        raise RuntimeError("No translation provider available.")
+
+    last_error: Optional[BaseException] = None
+    while candidates:
+        primary = candidates.pop(0)
+        pending = {asyncio.create_task(_attempt(primary, request))}
+        try:
+            if router_config.hedge and candidates:
+                hedge_after = primary.health.percentile(0.95) or router_config.hedge_after
+                done, _ = await asyncio.wait(pending, timeout=hedge_after)
+                if not done:
+                    hedge_provider = candidates.pop(0)
+                    log.debug(
+                        f"{primary.name} exceeded {round(hedge_after, 2)} seconds, hedging with {hedge_provider.name}."
+                    )
+                    pending.add(asyncio.create_task(_attempt(hedge_provider, request)))
+
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        for loser in pending:
+                            await _cancel(loser)
+                        return task.result()
+                    last_error = task.exception()
+                    log.warning(f"Translation request failed: {last_error}")
+        except asyncio.CancelledError:
+            for task in pending:
+                await _cancel(task)
+            raise
+
+    raise last_error
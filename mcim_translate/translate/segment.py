@@ -0,0 +1,90 @@
+from pydantic import BaseModel
+from typing import List, Optional
+import re
+
+# 原文按句末标点后的空白或换行切分，保留分隔符以便还原格式
+_ORIGINAL_SPLIT = re.compile(r"((?<=[.!?。！？])[ \t]+|\s*\n\s*)")
+# 译文中文句末标点后不一定有空白
+_TRANSLATED_SPLIT = re.compile(r"((?<=[。！？!?])[ \t]*|(?<=\.)[ \t]+|\s*\n\s*)")
+
+_CJK_END = ("。", "！", "？", "；", "：", "”", "）")
+
+
+class Segment(BaseModel):
+    original: str
+    translated: str
+
+
+def _split(pattern: re.Pattern, text: str) -> tuple[List[str], List[str]]:
+    """
+    返回 (句子列表, 分隔符列表)，分隔符列表比句子列表少一个
+    """
+    sentences: List[str] = []
+    separators: List[str] = []
+    parts = pattern.split(text.strip())
+    for index in range(0, len(parts), 2):
+        sentence = parts[index].strip()
+        separator = parts[index + 1] if index + 1 < len(parts) else ""
+        if sentence:
+            sentences.append(sentence)
+            separators.append(separator)
+        elif separators and "\n" in separator:
+            # 连续的空行合并到上一个分隔符
+            separators[-1] += separator
+    return sentences, separators[:-1] if separators else []
+
+
+def split_segments(text: str) -> tuple[List[str], List[str]]:
+    return _split(_ORIGINAL_SPLIT, text)
+
+
+def normalize_segment(sentence: str) -> str:
+    return re.sub(r"\s+", " ", sentence).strip()
+
+
+def _paragraph_sizes(separators: List[str]) -> List[int]:
+    sizes = [1]
+    for separator in separators:
+        if "\n" in separator:
+            sizes.append(1)
+        else:
+            sizes[-1] += 1
+    return sizes
+
+
+def align_segments(original: str, translated: Optional[str]) -> Optional[List[Segment]]:
+    """
+    按句子对齐原文与译文
+
+    仅在每个段落的句子数都一致时才认为可以对齐，否则返回 None
+    """
+    if not translated:
+        return None
+    original_sentences, original_separators = split_segments(original)
+    translated_sentences, translated_separators = _split(_TRANSLATED_SPLIT, translated)
+    if len(original_sentences) != len(translated_sentences):
+        return None
+    if _paragraph_sizes(original_separators) != _paragraph_sizes(translated_separators):
+        return None
+    return [
+        Segment(original=original_sentence, translated=translated_sentence)
+        for original_sentence, translated_sentence in zip(
+            original_sentences, translated_sentences
+        )
+    ]
+
+
+def join_segments(pieces: List[str], separators: List[str]) -> str:
+    """
+    按原文的分隔符拼接译文句子，换行原样保留，中文句末标点后不加空格
+    """
+    text = pieces[0] if pieces else ""
+    for piece, separator in zip(pieces[1:], separators):
+        if "\n" in separator:
+            text += "\n" * separator.count("\n")
+        elif text.endswith(_CJK_END):
+            pass
+        else:
+            text += " "
+        text += piece
+    return text
@@ -0,0 +1,68 @@
+from enum import Enum
+from typing import Optional
+import re
+
+from mcim_translate.config import Config
+
+translate_config = Config.load().translate
+
+_CJK = re.compile(r"[\u4e00-\u9fa5]")
+_LATIN = re.compile(r"[A-Za-z]")
+_URL = re.compile(r"(?:https?://|www\.)\S+", re.IGNORECASE)
+_VERSION = re.compile(
+    r"^(?:v|version\s*)?\d+(?:\.\d+)+(?:[-+][\w.]+)?$", re.IGNORECASE
+)
+# 模组名称：单个词，可带 - _ . ' + 等连接符
+_NAME = re.compile(r"^[\w.'+\-:]+$")
+# 普通单词不算模组名称，需要有名称的特征：词中大写（JourneyMap）、全大写缩写（JEI）、数字或连接符
+_NAME_FEATURE = re.compile(r"[a-z][A-Z]|^[A-Z0-9]{2,}$|\d|\w[_.+\-:]\w")
+
+
+class SkipReason(Enum):
+    EMPTY = "empty"
+    CHINESE = "chinese"
+    URL = "url"
+    VERSION = "version"
+    NAME = "name"
+    SYMBOL = "symbol"
+
+
+def classify_text(
+    text: Optional[str],
+    chinese_ratio: float = translate_config.skip_chinese_ratio,
+    max_name_length: int = translate_config.skip_max_name_length,
+) -> Optional[SkipReason]:
+    """
+    判断文本是否无需翻译，返回原因；需要翻译时返回 None
+
+    - 空白文本
+    - 汉字占字母的比例达到 chinese_ratio
+    - 只有链接
+    - 只有版本号
+    - 只有单个不超过 max_name_length 且像名称的词（见 _NAME_FEATURE），视为模组名称；Decorations 这样的普通单词仍需翻译
+    - 没有字母和数字，只有 emoji 或符号
+    """
+    stripped = (text or "").strip()
+    if not stripped:
+        return SkipReason.EMPTY
+
+    without_urls = _URL.sub("", stripped).strip()
+    if not without_urls:
+        return SkipReason.URL
+    if not any(c.isalnum() for c in without_urls):
+        return SkipReason.SYMBOL if without_urls == stripped else SkipReason.URL
+
+    cjk = len(_CJK.findall(stripped))
+    latin = len(_LATIN.findall(stripped))
+    if cjk and cjk / (cjk + latin) >= chinese_ratio:
+        return SkipReason.CHINESE
+
+    if _VERSION.match(stripped):
+        return SkipReason.VERSION
+    if (
+        len(stripped) <= max_name_length
+        and _NAME.match(stripped)
+        and _NAME_FEATURE.search(stripped)
+    ):
+        return SkipReason.NAME
+    return None
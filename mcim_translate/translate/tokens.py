@@ -0,0 +1,33 @@
+from typing import Iterable
+import math
+import re
+
+# 中日韩字符大约一个字一个 token，其余文本大约四个字符一个 token
+_CJK = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+# 每条消息的格式开销
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    本地粗略估算 token 数，不依赖具体模型的分词器
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def estimate_messages_tokens(messages: Iterable[dict]) -> int:
+    return sum(
+        estimate_tokens(message.get("content") or "") + MESSAGE_OVERHEAD
+        for message in messages
+    )
+
+
+def estimate_translation_tokens(text: str, prompt_tokens: int = 0) -> int:
+    """
+    估算翻译一段文本的总 token：提示词 + 原文 + 与原文相当的译文
+    """
+    return prompt_tokens + MESSAGE_OVERHEAD * 2 + estimate_tokens(text) * 2
@@ -0,0 +1,162 @@
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+from datetime import datetime
+from typing import Optional
+import asyncio
+import time
+
+from mcim_translate.database.mongodb import STATE_COLLECTION
+from mcim_translate.database.mongodb.query.lease import claimable_query
+from mcim_translate.pipeline import IdleCallback, open_pipeline_context
+from mcim_translate.pipeline.scheduler import FairShareScheduler
+from mcim_translate.translate import translated_collection_name
+from mcim_translate.config import Config
+from mcim_translate.constants import Platform
+from mcim_translate.logger import log
+
+watch_config = Config.load().watch
+
+# 只关心 need_to_update 被设为 True 的变更，写回译文和领取租约都不会触发
+CHANGE_STREAM_PIPELINE = [
+    {
+        "$match": {
+            "$or": [
+                {
+                    "operationType": {"$in": ["insert", "replace"]},
+                    "fullDocument.need_to_update": True,
+                },
+                {
+                    "operationType": "update",
+                    "updateDescription.updatedFields.need_to_update": True,
+                },
+            ]
+        }
+    }
+]
+
+# 不支持 change stream（非副本集）
+CHANGE_STREAM_UNSUPPORTED = {40573, 40324}
+# resume token 已不在 oplog 中
+CHANGE_STREAM_HISTORY_LOST = 286
+# change stream 出错后重连的退避秒数
+WATCH_RETRY_MIN = 1.0
+WATCH_RETRY_MAX = 60.0
+
+
+class TranslationWatcher:
+    """
+    监听 *_translated 集合中 need_to_update 变为 True 的变更，通过 wake 事件唤醒流水线
+
+    resume token 保存在 translate_state 集合中，重启后从上次的位置继续；
+    连接中断等错误按退避重连，只有数据库不支持 change stream 时才退化为定时轮询
+    """
+
+    def __init__(self, database: AsyncDatabase, platform: Platform, wake: asyncio.Event):
+        self.database = database
+        self.platform = platform
+        self.wake = wake
+        self.collection_name = translated_collection_name(platform)
+        self.state_collection = database.get_collection(STATE_COLLECTION)
+        self._state_id = f"change_stream:{self.collection_name}"
+        self._saved_at = 0.0
+
+    async def _load_resume_token(self) -> Optional[dict]:
+        state = await self.state_collection.find_one({"_id": self._state_id})
+        return state.get("resume_token") if state else None
+
+    async def _save_resume_token(self, token: Optional[dict], force: bool = False):
+        if token is None:
+            return
+        if not force and time.time() - self._saved_at < watch_config.resume_token_interval:
+            return
+        await self.state_collection.update_one(
+            {"_id": self._state_id},
+            {"$set": {"resume_token": token, "updated_at": datetime.now()}},
+            upsert=True,
+        )
+        self._saved_at = time.time()
+
+    async def _watch(self):
+        """
+        不支持 change stream 时抛出 OperationFailure，其他错误（网络中断、主节点切换等）按退避重连
+        """
+        collection = self.database.get_collection(self.collection_name)
+        resume_token: Optional[dict] = None
+        reload_token = True
+        backoff = WATCH_RETRY_MIN
+        while True:
+            try:
+                if reload_token:
+                    resume_token = await self._load_resume_token()
+                reload_token = True
+                async with await collection.watch(
+                    CHANGE_STREAM_PIPELINE, resume_after=resume_token
+                ) as stream:
+                    log.info(f"Watching {self.collection_name} change stream.")
+                    backoff = WATCH_RETRY_MIN
+                    try:
+                        async for change in stream:
+                            log.debug(
+                                f"{self.platform.value} {change['documentKey']['_id']} needs translation."
+                            )
+                            self.wake.set()
+                            await self._save_resume_token(stream.resume_token)
+                    finally:
+                        await self._save_resume_token(stream.resume_token, force=True)
+                continue
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    raise
+                if e.code == CHANGE_STREAM_HISTORY_LOST and resume_token is not None:
+                    log.warning(
+                        f"Resume token of {self.collection_name} expired, restarting change stream."
+                    )
+                    resume_token = None
+                    reload_token = False
+                    # 丢失的变更由流水线全量扫描补上
+                    self.wake.set()
+                    continue
+                error: PyMongoError = e
+            except PyMongoError as e:
+                error = e
+            log.warning(
+                f"Change stream on {self.collection_name} failed ({error}), retrying in {backoff} seconds."
+            )
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, WATCH_RETRY_MAX)
+
+    async def _poll(self):
+        collection = self.database.get_collection(self.collection_name)
+        while True:
+            if await collection.find_one(claimable_query(datetime.now()), {"_id": 1}):
+                self.wake.set()
+            await asyncio.sleep(watch_config.poll_interval)
+
+    async def run(self):
+        try:
+            await self._watch()
+        except OperationFailure as e:
+            if e.code not in CHANGE_STREAM_UNSUPPORTED:
+                raise
+            log.warning(
+                f"Change streams are unavailable on {self.collection_name} ({e}), polling every {watch_config.poll_interval} seconds."
+            )
+        await self._poll()
+
+
+async def run_watch_mode(on_idle: Optional[IdleCallback] = None):
+    """
+    两个平台各自一个持续运行的流水线，由 change stream（或轮询）唤醒，共享同一个 FairShareScheduler 翻译
+    """
+    async with open_pipeline_context() as context:
+        scheduler = FairShareScheduler()
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(scheduler.run())
+            for platform in Platform:
+                wake = asyncio.Event()
+                tg.create_task(TranslationWatcher(context.database, platform, wake).run())
+                tg.create_task(
+                    context.pipeline(
+                        platform, wake=wake, on_idle=on_idle, scheduler=scheduler
+                    ).run()
+                )